@@ -1,27 +1,106 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Request
+import asyncio
+import json
+from datetime import datetime
+from typing import List, Optional
+from fastapi import (
+    APIRouter, BackgroundTasks, Depends, File, Header, HTTPException, Request, UploadFile,
+    WebSocket, WebSocketDisconnect
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from database import FormulaHistory, get_db
-from models import FormulaRequest, FormulaResponse, FormulaHistoryModel
-from services import calculate_molar_mass, save_to_database, update_formula_in_history, delete_formula_from_history
-from data import get_chemical_properties
+from database import SessionLocal, get_db
+from models import (
+    FormulaRequest,
+    FormulaResponse,
+    FormulaHistoryModel,
+    IsotopePatternRequest,
+    IsotopePatternResponse,
+    EquationRequest,
+    EquationResponse,
+    FormulaSearchRequest,
+    FormulaSearchResponse,
+    HistorySelection,
+    BulkUpdateRequest,
+    BulkOperationResponse,
+    FormulaUsageStat,
+    CalculationBucketStat,
+    HistoryStatsSummary
+)
+from services import (
+    calculate_molar_mass,
+    IncrementalFormulaParser,
+    calculate_isotope_pattern,
+    calculate_monoisotopic_mass,
+    search_formulas,
+    balance_equation,
+    save_to_database,
+    get_recent_history,
+    update_history_properties,
+    update_formula_in_history,
+    delete_formula_from_history,
+    bulk_update_history,
+    bulk_delete_history,
+    get_top_formulas,
+    get_calculation_series,
+    get_stats_summary,
+    export_history,
+    import_history,
+    EXPORT_FORMATS,
+    search_history,
+    warmup_status
+)
+from data import get_chemical_properties, fetch_chemical_properties
 from core import settings
+from utils import Deadline, get_slow_requests, stage
 
 router = APIRouter()
 
 #=========================================================================
 #=========================================================================
 
+def _finish_enrichment(formula: str, molar_mass: float, client_ip: Optional[str], formula_id: Optional[int]) -> None:
+    """Complete a request whose deadline ran out: fetch all properties, then save or update its history entry."""
+    # Bounded as well, so a slow PubChem cannot pile up background work behind every request
+    properties, _ = fetch_chemical_properties(formula, Deadline.from_ms(settings.REQUEST_DEADLINE_MAX_MS))
+    db = SessionLocal()
+    try:
+        if formula_id is None:
+            save_to_database(db, formula, molar_mass, properties, client_ip=client_ip)
+        else:
+            update_history_properties(db, formula_id, properties)
+    finally:
+        db.close()
+
+
 @router.post("/molar-mass", response_model=FormulaResponse)
-def get_molar_mass(request: FormulaRequest, db: Session = Depends(get_db), req: Request = None):
-    """Calculate molar mass and fetch chemical properties for a given formula."""
+@stage("get_molar_mass")
+def get_molar_mass(
+    request: FormulaRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    req: Request = None,
+    x_request_deadline_ms: Optional[int] = Header(None)
+):
+    """Calculate molar mass and fetch chemical properties for a given formula within the request deadline."""
     try:
+        budget_ms = next(
+            (value for value in (x_request_deadline_ms, request.deadline_ms) if value is not None),
+            settings.REQUEST_DEADLINE_DEFAULT_MS
+        )
+        if budget_ms <= 0:
+            raise ValueError("Request deadline must be a positive number of milliseconds")
+        deadline = Deadline.from_ms(min(budget_ms, settings.REQUEST_DEADLINE_MAX_MS))
+        
         # Calculate molar mass
-        molar_mass = calculate_molar_mass(request.formula)
+        with stage("calculate_molar_mass"):
+            molar_mass = calculate_molar_mass(request.formula)
         
-        # Fetch physical/chemical properties from PubChem API
-        properties = get_chemical_properties(request.formula)
+        # Fetch physical/chemical properties from PubChem API, as far as the deadline allows
+        with stage("fetch_chemical_properties"):
+            properties, complete = fetch_chemical_properties(request.formula, deadline)
         
         # Create result with properties (use values from API if available)
         result = {
@@ -36,11 +115,18 @@ def get_molar_mass(request: FormulaRequest, db: Session = Depends(get_db), req:
             "hazard_classification": properties.get("hazard_classification"),
             "structure_image_url": properties.get("structure_image_url"),
             "structure_image_svg_url": properties.get("structure_image_svg_url"),
-            "compound_url": properties.get("compound_url")
+            "compound_url": properties.get("compound_url"),
+            "partial": not complete
         }
         
-        # Save to database (non-critical operation)
-        save_to_database(db, request.formula, molar_mass, properties, req)
+        # Save to database (non-critical operation), deferred if the budget is already spent
+        client_ip = req.client.host if req and req.client else None
+        if deadline.expired():
+            background_tasks.add_task(_finish_enrichment, request.formula, molar_mass, client_ip, None)
+        else:
+            formula_id = save_to_database(db, request.formula, molar_mass, properties, client_ip=client_ip)
+            if not complete:
+                background_tasks.add_task(_finish_enrichment, request.formula, molar_mass, client_ip, formula_id)
         
         return result
     except ValueError as e:
@@ -51,11 +137,289 @@ def get_molar_mass(request: FormulaRequest, db: Session = Depends(get_db), req:
 #=========================================================================
 #=========================================================================
 
+def _enrich_and_save(formula: str, molar_mass: float, client_ip: Optional[str]) -> dict:
+    """Fetch properties for a settled live formula and record it in the history."""
+    properties = get_chemical_properties(formula)
+    db = SessionLocal()
+    try:
+        save_to_database(db, formula, molar_mass, properties, client_ip=client_ip)
+    finally:
+        db.close()
+    return properties
+
+
+@router.websocket("/ws/molar-mass")
+async def live_molar_mass(websocket: WebSocket):
+    """
+    Live molar mass while the user types.
+    
+    Each message is the full current input (plain text or {"formula": ...}).
+    A "mass" message is sent back immediately; PubChem enrichment and the
+    history write only happen once the input has been unchanged for
+    LIVE_ENRICHMENT_DEBOUNCE_MS, and are then pushed as a "properties" message.
+    """
+    await websocket.accept()
+    parser = IncrementalFormulaParser()
+    client_ip = websocket.client.host if websocket.client else None
+    send_lock = asyncio.Lock()
+    state = {"enriched": None, "settling": None}
+    tasks = set()
+    
+    async def send(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+    
+    async def enrich_when_settled(formula: str, molar_mass: float):
+        await asyncio.sleep(settings.LIVE_ENRICHMENT_DEBOUNCE_MS / 1000)
+        # Past the debounce the enrichment is committed to and no longer cancelled by new input
+        state["settling"] = None
+        state["enriched"] = formula
+        properties = await run_in_threadpool(_enrich_and_save, formula, molar_mass, client_ip)
+        try:
+            await send({"type": "properties", "formula": formula, "molar_mass": molar_mass, "unit": "g/mol", **properties})
+        except (WebSocketDisconnect, RuntimeError):
+            pass  # Client left while PubChem was answering; the history entry is saved regardless
+    
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                formula = json.loads(message).get("formula", "")
+            except (ValueError, AttributeError):
+                formula = message
+            if not isinstance(formula, str):
+                # Malformed messages are answered, not fatal: the connection stays open
+                await send({"type": "error", "error": "'formula' must be a string"})
+                continue
+            formula = formula.strip()
+            
+            result = parser.update(formula)
+            await send({"type": "mass", "unit": "g/mol", **result})
+            
+            # Every keystroke restarts the debounce
+            if state["settling"]:
+                state["settling"].cancel()
+                state["settling"] = None
+            if result["valid"] and formula != state["enriched"]:
+                task = asyncio.create_task(enrich_when_settled(formula, result["molar_mass"]))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                state["settling"] = task
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if state["settling"]:
+            state["settling"].cancel()
+
+#=========================================================================
+#=========================================================================
+
+@router.post("/isotope-pattern", response_model=IsotopePatternResponse)
+def get_isotope_pattern(request: IsotopePatternRequest):
+    """Calculate the monoisotopic mass and isotopic distribution for a given formula."""
+    try:
+        return {
+            "formula": request.formula,
+            "monoisotopic_mass": round(calculate_monoisotopic_mass(request.formula), 6),
+            "average_mass": round(calculate_molar_mass(request.formula), 4),
+            "unit": "u",
+            "peaks": calculate_isotope_pattern(request.formula, request.min_intensity)
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+#=========================================================================
+#=========================================================================
+
+@router.post("/balance-equation", response_model=EquationResponse)
+def get_balanced_equation(request: EquationRequest):
+    """Balance a chemical equation and return the molar mass of every species."""
+    try:
+        return balance_equation(request.equation)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+#=========================================================================
+#=========================================================================
+
+@router.post("/formula-search", response_model=FormulaSearchResponse)
+def formula_search(request: FormulaSearchRequest):
+    """Find candidate formulas whose mass matches a target mass within a tolerance."""
+    tolerance = request.tolerance
+    if request.tolerance_ppm is not None:
+        tolerance = request.target_mass * request.tolerance_ppm / 1e6
+    elements = None
+    if request.elements:
+        elements = {element: (limits.min, limits.max) for element, limits in request.elements.items()}
+    
+    try:
+        candidates, truncated = search_formulas(
+            request.target_mass,
+            tolerance,
+            elements,
+            request.mass_type,
+            min(request.max_results, settings.FORMULA_SEARCH_MAX_RESULTS),
+            request.rdbe_min,
+            request.rdbe_max,
+            request.valence_check,
+            min(request.timeout_ms or settings.FORMULA_SEARCH_TIMEOUT_MS, settings.FORMULA_SEARCH_TIMEOUT_MS)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "target_mass": request.target_mass,
+        "tolerance": tolerance,
+        "mass_type": request.mass_type,
+        "truncated": truncated,
+        "candidates": candidates
+    }
+
+#=========================================================================
+#=========================================================================
+
 @router.get("/history", response_model=List[FormulaHistoryModel])
 def get_history(limit: int = settings.HISTORY_LIMIT_DEFAULT, db: Session = Depends(get_db)):
     """Get formula calculation history."""
-    formulas = db.query(FormulaHistory).order_by(FormulaHistory.timestamp.desc()).limit(limit).all()
-    return formulas
+    return get_recent_history(db, limit)
+
+#=========================================================================
+#=========================================================================
+
+@router.get("/history/search", response_model=List[FormulaHistoryModel])
+def search_formula_history(
+    formula_prefix: Optional[str] = None,
+    contains: Optional[str] = None,
+    name: Optional[str] = None,
+    limit: int = settings.HISTORY_LIMIT_DEFAULT,
+    db: Session = Depends(get_db)
+):
+    """Search history by formula prefix, contained elements (e.g. contains=Cl,N) and IUPAC name substring."""
+    elements = [element.strip() for element in contains.split(",") if element.strip()] if contains else None
+    try:
+        return search_history(db, formula_prefix, elements, name, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+#=========================================================================
+#=========================================================================
+
+@router.get("/history/stats/top-formulas", response_model=List[FormulaUsageStat])
+def get_top_formulas_stats(
+    granularity: str = "day",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = settings.HISTORY_LIMIT_DEFAULT,
+    db: Session = Depends(get_db)
+):
+    """Most calculated formulas, read from the hourly/daily rollups."""
+    try:
+        return get_top_formulas(db, granularity, since, until, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+#=========================================================================
+#=========================================================================
+
+@router.get("/history/stats/calculations", response_model=List[CalculationBucketStat])
+def get_calculation_stats(
+    granularity: str = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """Calculations and unique clients per hour or day, read from the rollups."""
+    try:
+        return get_calculation_series(db, granularity, since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+#=========================================================================
+#=========================================================================
+
+@router.get("/history/stats/summary", response_model=HistoryStatsSummary)
+def get_history_stats_summary(
+    granularity: str = "day",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """Total calculations, unique clients and unique formulas in a time window."""
+    try:
+        return get_stats_summary(db, granularity, since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+#=========================================================================
+#=========================================================================
+
+@router.get("/history/export")
+def export_history_file(format: str = "csv"):
+    """Stream the complete history as CSV, NDJSON or Parquet."""
+    try:
+        chunks = export_history(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="history.{format}"'}
+    )
+
+#=========================================================================
+#=========================================================================
+
+@router.post("/history/import")
+def import_history_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    keep_ids: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Bulk-import history from a CSV, NDJSON or Parquet export."""
+    import_format = format or (file.filename or "").rsplit(".", 1)[-1].lower()
+    try:
+        imported = import_history(db, file.file, import_format, keep_ids)
+        return {"message": f"Imported {imported} history entries", "imported": imported}
+    except IntegrityError as e:
+        raise HTTPException(status_code=409, detail=f"Import rolled back, an ID already exists: {e.orig}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error importing history: {str(e)}")
+
+#=========================================================================
+#=========================================================================
+
+@router.post("/history/bulk-update", response_model=BulkOperationResponse)
+def bulk_update_formulas(request: BulkUpdateRequest, db: Session = Depends(get_db)):
+    """Update all matching history entries in batches: set a new formula or recompute molar masses."""
+    try:
+        return bulk_update_history(
+            db, request.new_formula, request.ids, request.formula, request.start, request.end, request.user_ip
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error updating formulas: {str(e)}")
+
+#=========================================================================
+#=========================================================================
+
+@router.post("/history/bulk-delete", response_model=BulkOperationResponse)
+def bulk_delete_formulas(request: HistorySelection, db: Session = Depends(get_db)):
+    """Delete all matching history entries in batches."""
+    try:
+        return bulk_delete_history(db, request.ids, request.formula, request.start, request.end, request.user_ip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error deleting formulas: {str(e)}")
 
 #=========================================================================
 #=========================================================================
@@ -65,6 +429,8 @@ def update_formula(formula_id: int, request: FormulaRequest, db: Session = Depen
     """Update a formula in the history."""
     try:
         return update_formula_in_history(db, formula_id, request.formula)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -78,12 +444,37 @@ def delete_formula(formula_id: int, db: Session = Depends(get_db)):
     """Delete a formula from the history."""
     try:
         return delete_formula_from_history(db, formula_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting formula: {str(e)}")
 
 #=========================================================================
 #=========================================================================
 
+@router.get("/admin/slow-requests")
+def list_slow_requests(x_profile_token: Optional[str] = Header(None)):
+    """Recent slow and profiled requests with stage timings, captured stacks and profiles."""
+    if not settings.PROFILING_TOKEN or x_profile_token != settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=403, detail="A valid X-Profile-Token header is required")
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set PROFILING_ENABLED=true)")
+    return [trace.to_dict() for trace in get_slow_requests()]
+
+#=========================================================================
+#=========================================================================
+
+@router.get("/ready")
+def readiness_check():
+    """Readiness probe: 503 while the startup cache warm-up is still running."""
+    warmup = warmup_status()
+    if warmup["status"] == "warming":
+        return JSONResponse(status_code=503, content={"status": "warming", "warmup": warmup})
+    return {"status": "ready", "warmup": warmup}
+
+#=========================================================================
+#=========================================================================
+
 @router.get("/")
 def health_check():
     """Health check endpoint."""
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Offline batch calculator for ChemCalc.
+
+Computes molar masses and compositions for large formula files without the
+HTTP server or a database. Formulas are read in chunks (one per line, blank
+lines and '#' comments are skipped), spread over a process pool and written
+as CSV or NDJSON in input order.
+
+Usage:
+    python cli.py formulas.txt -o results.csv
+    cat formulas.txt | python cli.py --format ndjson --workers 8 > results.ndjson
+    python cli.py formulas.txt --properties   # add PubChem properties from the local cache
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, TextIO
+
+# Only the formula service and the property cache are imported: no SQLAlchemy, no requests
+from data.property_cache import PROPERTY_COLUMNS, get_property_cache
+from services.formula_service import calculate_molar_mass, parse_formula
+
+
+RESULT_COLUMNS = ("formula", "molar_mass", "composition", "error")
+
+
+def _composition(formula: str) -> Dict[str, int]:
+    counts = {}
+    for element, count in parse_formula(formula):
+        counts[element] = counts.get(element, 0) + count
+    return counts
+
+
+def process_chunk(formulas: List[str], with_properties: bool = False) -> List[Dict]:
+    """Calculate one chunk of formulas (runs in a worker process)."""
+    cache = get_property_cache() if with_properties else None
+
+    results = []
+    for formula in formulas:
+        result = {"formula": formula, "molar_mass": None, "composition": None, "error": None}
+        try:
+            result["molar_mass"] = round(calculate_molar_mass(formula), 4)
+            result["composition"] = _composition(formula)
+        except ValueError as e:
+            result["error"] = str(e)
+        if with_properties:
+            cached = cache.get(formula) if cache is not None and result["error"] is None else None
+            for column in PROPERTY_COLUMNS:
+                result[column] = cached.get(column) if cached else None
+        results.append(result)
+    return results
+
+
+def read_chunks(streams: Iterable[TextIO], chunk_size: int) -> Iterator[List[str]]:
+    """Yield lists of up to `chunk_size` formulas from the input streams."""
+    def formulas():
+        for stream in streams:
+            for line in stream:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield line
+
+    lines = formulas()
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def calculate_in_order(
+    chunks: Iterable[List[str]],
+    workers: int,
+    with_properties: bool = False
+) -> Iterator[List[Dict]]:
+    """
+    Process chunks on a process pool and yield their results in input order.
+
+    At most two chunks per worker are in flight, so memory stays bounded no
+    matter how large the input is.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield process_chunk(chunk, with_properties)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(process_chunk, chunk, with_properties))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_results(batches: Iterable[List[Dict]], output: TextIO, output_format: str, with_properties: bool) -> int:
+    """Write result batches as CSV or NDJSON; returns the number of rows written."""
+    written = 0
+    if output_format == "ndjson":
+        for batch in batches:
+            output.write("".join(json.dumps(result) + "\n" for result in batch))
+            written += len(batch)
+        return written
+
+    columns = RESULT_COLUMNS + (PROPERTY_COLUMNS if with_properties else ())
+    writer = csv.writer(output)
+    writer.writerow(columns)
+    for batch in batches:
+        for result in batch:
+            row = dict(result)
+            if row["composition"]:
+                row["composition"] = ";".join(f"{element}:{count}" for element, count in row["composition"].items())
+            writer.writerow([row[column] for column in columns])
+        written += len(batch)
+    return written
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compute molar masses and compositions for formula files offline.")
+    parser.add_argument("inputs", nargs="*", help="Formula files, one formula per line (default: stdin, '-' also means stdin)")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    parser.add_argument("-f", "--format", choices=("csv", "ndjson"), default="csv", help="Output format (default: csv)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=1000, help="Formulas per work unit (default: 1000)")
+    parser.add_argument(
+        "-p", "--properties", action="store_true",
+        help="Add PubChem properties from the local shared property cache (never queries PubChem)"
+    )
+    args = parser.parse_args(argv)
+
+    if args.chunk_size < 1 or args.workers < 1:
+        parser.error("--workers and --chunk-size must be positive")
+
+    streams = []
+    try:
+        for path in args.inputs or ["-"]:
+            streams.append(sys.stdin if path == "-" else open(path, encoding="utf-8"))
+        output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+        try:
+            batches = calculate_in_order(read_chunks(streams, args.chunk_size), args.workers, args.properties)
+            written = write_results(batches, output, args.format, args.properties)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        for stream in streams:
+            if stream is not sys.stdin:
+                stream.close()
+
+    print(f"Processed {written} formulas", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
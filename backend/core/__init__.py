@@ -3,5 +3,6 @@ Core package for ChemCalc backend.
 Contains configuration settings and core functionality.
 """
 from .config import settings
+from .logging_config import configure_logging, get_logger, RequestIdMiddleware
 
-__all__ = ["settings"]
\ No newline at end of file
+__all__ = ["settings", "configure_logging", "get_logger", "RequestIdMiddleware"]
\ No newline at end of file
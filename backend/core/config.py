@@ -1,7 +1,15 @@
-import json
 import os
+import tempfile
 from typing import Dict
 
+from dotenv import load_dotenv
+
+from .periodic_table import atomic_masses
+
+
+# Settings read the environment at import time, so .env must be loaded first
+load_dotenv()
+
 
 class Settings:
     """Application settings and configuration"""
@@ -16,21 +24,77 @@ class Settings:
     CORS_METHODS: list = ["*"]
     CORS_HEADERS: list = ["*"]
     
+    # Logging (JSON lines written by a background thread)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS: str = os.getenv("LOG_LEVELS", "")  # per subsystem, e.g. "pubchem=DEBUG,database=WARNING"
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+    LOG_QUEUE_SIZE: int = 10000  # records beyond this are dropped rather than blocking requests
+    
     # Database Configuration
     HISTORY_LIMIT_DEFAULT: int = 10
     
+    # History partitioning (monthly partitions, whole partitions are dropped on expiry)
+    HISTORY_RETENTION_MONTHS: int = int(os.getenv("HISTORY_RETENTION_MONTHS", "0"))  # 0 keeps history forever
+    HISTORY_PARTITIONS_AHEAD: int = 3
+    HISTORY_PARTITION_MAINTENANCE_INTERVAL: int = 6 * 60 * 60  # seconds
+    
+    # In-process caches of parsed formulas and molar masses (per worker)
+    FORMULA_CACHE_SIZE: int = 4096
+    
+    # Startup warm-up of the caches from the most frequent history formulas
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_FORMULAS: int = int(os.getenv("WARMUP_FORMULAS", "500"))
+    WARMUP_LOOKBACK_DAYS: int = 30
+    WARMUP_BUDGET_SECONDS: float = float(os.getenv("WARMUP_BUDGET_SECONDS", "10"))
+    WARMUP_CONCURRENCY: int = 4
+    
+    # Reverse mass lookup
+    FORMULA_SEARCH_TIMEOUT_MS: int = 2000
+    FORMULA_SEARCH_MAX_RESULTS: int = 100
+    FORMULA_SEARCH_MAX_TOLERANCE: float = 1.0  #absolute, bounds the searched mass window
+    
+    # Request deadlines (clients may send X-Request-Deadline-Ms or deadline_ms)
+    REQUEST_DEADLINE_DEFAULT_MS: int = int(os.getenv("REQUEST_DEADLINE_DEFAULT_MS", "2000"))
+    REQUEST_DEADLINE_MAX_MS: int = 30000
+    
+    # Opt-in request profiling and slow-request capture (off: no middleware is installed)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+    PROFILING_TOKEN: str = os.getenv("PROFILING_TOKEN", "")  # X-Profile-Token value that profiles a request; also guards /admin
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    SLOW_REQUEST_THRESHOLD_MS: int = int(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "1000"))
+    SLOW_REQUEST_BUFFER_SIZE: int = 100
+    PROFILE_TOP_FUNCTIONS: int = 30
+    
+    # Live calculation over WebSocket: enrichment and history writes wait until typing pauses
+    LIVE_ENRICHMENT_DEBOUNCE_MS: int = 800
+    
+    # PubChem client resilience (circuit breaker and hedged requests)
+    PUBCHEM_BREAKER_FAILURE_RATE: float = 0.5  # share of failed or slow calls that opens the breaker
+    PUBCHEM_BREAKER_WINDOW: int = 20  # calls considered for the failure rate
+    PUBCHEM_BREAKER_MIN_CALLS: int = 5
+    PUBCHEM_BREAKER_RESET_TIMEOUT: float = 30.0  # seconds open before a probe is let through
+    PUBCHEM_SLOW_CALL_SECONDS: float = 5.0
+    PUBCHEM_HEDGE_QUANTILE: float = 0.95  # a second request is sent once a call outlives this latency quantile
+    PUBCHEM_HEDGE_DELAY_DEFAULT: float = 1.0  # seconds, used until enough latencies are observed
+    PUBCHEM_MAX_CONCURRENCY: int = 32
+    
+    # Shared property cache (one mmap'd file shared by all workers on a host)
+    PROPERTY_CACHE_ENABLED: bool = os.getenv("PROPERTY_CACHE_ENABLED", "true").lower() == "true"
+    PROPERTY_CACHE_PATH: str = os.getenv(
+        "PROPERTY_CACHE_PATH",
+        os.path.join(tempfile.gettempdir(), "chemcalc_property_cache.bin")
+    )
+    PROPERTY_CACHE_BUCKETS: int = int(os.getenv("PROPERTY_CACHE_BUCKETS", "2048"))
+    PROPERTY_CACHE_WAYS: int = 8
+    PROPERTY_CACHE_SLOT_SIZE: int = 2048
+    PROPERTY_CACHE_TTL_SECONDS: int = int(os.getenv("PROPERTY_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    
     def __init__(self):
         self.atomic_masses = self._load_atomic_masses()
     
     def _load_atomic_masses(self) -> Dict[str, float]:
-        """Load atomic mass data from JSON file"""
-        try:
-            with open("./atomic_masses.json") as file:
-                return json.load(file)
-        except FileNotFoundError:
-            # Fallback to direct path if running from different directory
-            with open("atomic_masses.json") as file:
-                return json.load(file)
+        """Load atomic mass data from the compiled periodic table"""
+        return atomic_masses()
 
 
 # Global settings instance
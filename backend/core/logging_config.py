@@ -0,0 +1,139 @@
+"""
+Structured, non-blocking logging.
+
+Request threads only put log records on a bounded in-memory queue; a single
+listener thread formats them as JSON lines and writes them out. Messages use
+%-style arguments so formatting also happens on the listener thread.
+"""
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from .config import settings
+
+
+ROOT_LOGGER = "chemcalc"
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+_listener: Optional[QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock QueueHandler formats the message in the calling thread; here the
+    record is only tagged with the current request ID. A full queue drops the
+    record instead of blocking the caller.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DeferredQueueHandler.dropped += 1
+
+
+def _parse_levels(spec: str) -> dict:
+    """Parse 'pubchem=DEBUG,database=WARNING' into {logger name: level}."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging() -> None:
+    """Install the queue handler and start the writer thread (idempotent)."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(
+            JsonFormatter() if settings.LOG_FORMAT == "json"
+            else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+        log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # flush what is still queued on shutdown
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.handlers[:] = [_DeferredQueueHandler(log_queue)]
+        root.setLevel(settings.LOG_LEVEL.upper())
+        root.propagate = False
+        for name, level in _parse_levels(settings.LOG_LEVELS).items():
+            logging.getLogger(f"{ROOT_LOGGER}.{name}").setLevel(level)
+
+
+def get_logger(subsystem: str) -> logging.Logger:
+    """Logger for a subsystem (e.g. 'pubchem'), whose level can be set via LOG_LEVELS."""
+    configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{subsystem}")
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving every request an ID for its log lines.
+
+    Uses the client's X-Request-ID header when present and echoes the ID back
+    in the response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        header = dict(scope["headers"]).get(b"x-request-id")
+        request_id = header.decode("latin-1")[:64] if header else uuid.uuid4().hex
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        reset = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(reset)
@@ -0,0 +1,110 @@
+"""
+Periodic table data compiled into the package.
+
+Elements are stored in arrays indexed by atomic number (index 0 is an unused
+sentinel), so compositions can be integer-coded and mass sums read from one
+contiguous array. Symbols are resolved with a precomputed perfect hash
+instead of string-keyed dict probes.
+"""
+from array import array
+from typing import Dict, Tuple
+
+
+ELEMENT_COUNT = 118
+
+# Element symbols by atomic number
+SYMBOLS: Tuple[str, ...] = (
+    "",
+    "H", "He", "Li", "Be", "B", "C", "N", "O", "F", "Ne",
+    "Na", "Mg", "Al", "Si", "P", "S", "Cl", "Ar", "K", "Ca",
+    "Sc", "Ti", "V", "Cr", "Mn", "Fe", "Co", "Ni", "Cu", "Zn",
+    "Ga", "Ge", "As", "Se", "Br", "Kr", "Rb", "Sr", "Y", "Zr",
+    "Nb", "Mo", "Tc", "Ru", "Rh", "Pd", "Ag", "Cd", "In", "Sn",
+    "Sb", "Te", "I", "Xe", "Cs", "Ba", "La", "Ce", "Pr", "Nd",
+    "Pm", "Sm", "Eu", "Gd", "Tb", "Dy", "Ho", "Er", "Tm", "Yb",
+    "Lu", "Hf", "Ta", "W", "Re", "Os", "Ir", "Pt", "Au", "Hg",
+    "Tl", "Pb", "Bi", "Po", "At", "Rn", "Fr", "Ra", "Ac", "Th",
+    "Pa", "U", "Np", "Pu", "Am", "Cm", "Bk", "Cf", "Es", "Fm",
+    "Md", "No", "Lr", "Rf", "Db", "Sg", "Bh", "Hs", "Mt", "Ds",
+    "Rg", "Cn", "Nh", "Fl", "Mc", "Lv", "Ts", "Og",
+)
+
+# Standard atomic weights in g/mol by atomic number
+# (mass number of the most stable isotope for elements without a standard weight)
+MASSES = array("d", [
+    0.0,
+    1.008, 4.0026, 6.94, 9.0122, 10.81, 12.011, 14.007, 15.999,
+    18.998, 20.18, 22.99, 24.305, 26.982, 28.085, 30.974, 32.06,
+    35.45, 39.948, 39.098, 40.078, 44.956, 47.867, 50.942, 51.996,
+    54.938, 55.845, 58.933, 58.693, 63.546, 65.38, 69.723, 72.63,
+    74.922, 78.971, 79.904, 83.798, 85.468, 87.62, 88.906, 91.224,
+    92.906, 95.95, 98.0, 101.07, 102.91, 106.42, 107.87, 112.41,
+    114.82, 118.71, 121.76, 127.6, 126.9, 131.29, 132.91, 137.33,
+    138.91, 140.12, 140.91, 144.24, 145.0, 150.36, 151.96, 157.25,
+    158.93, 162.5, 164.93, 167.26, 168.93, 173.05, 174.97, 178.49,
+    180.95, 183.84, 186.21, 190.23, 192.22, 195.08, 196.97, 200.59,
+    204.38, 207.2, 208.98, 209.0, 210.0, 222.0, 223.0, 226.0,
+    227.0, 232.04, 231.04, 238.03, 237.0, 244.0, 243.0, 247.0,
+    247.0, 251.0, 252.0, 257.0, 258.0, 259.0, 262.0, 267.0,
+    270.0, 271.0, 270.0, 277.0, 276.0, 281.0, 280.0, 285.0,
+    286.0, 289.0, 290.0, 293.0, 294.0, 294.0,
+])
+
+# Perfect hash for symbol lookup: slot = (code * 7 + _DISPLACEMENTS[code % 39]) % 128,
+# where code packs the symbol's one or two characters into 16 bits.
+_DISPLACEMENTS = (
+    23, 0, 27, 1, 68, 51, 1, 16, 5, 14, 8, 40, 24,
+    8, 34, 39, 2, 0, 12, 74, 19, 38, 4, 13, 0, 4,
+    67, 32, 65, 70, 57, 12, 18, 0, 1, 20, 2, 20, 17,
+)
+
+# Atomic number stored in each hash slot (0 = empty)
+_SLOTS = bytes([
+    1, 74, 112, 86, 8, 39, 50, 95, 96, 102, 25, 69, 6, 27, 5, 30,
+    53, 93, 16, 23, 92, 67, 0, 7, 19, 49, 84, 113, 0, 0, 68, 35,
+    87, 0, 0, 100, 0, 33, 99, 91, 73, 108, 103, 18, 36, 117, 109, 105,
+    85, 42, 82, 15, 71, 63, 51, 43, 76, 59, 89, 44, 64, 110, 40, 29,
+    60, 41, 65, 75, 26, 34, 115, 32, 2, 57, 9, 104, 98, 31, 116, 20,
+    10, 54, 12, 101, 52, 4, 118, 21, 72, 80, 45, 66, 46, 106, 48, 24,
+    22, 83, 77, 3, 38, 111, 94, 37, 56, 47, 58, 55, 107, 88, 0, 70,
+    78, 11, 14, 90, 13, 81, 79, 0, 17, 0, 0, 62, 114, 61, 97, 28,
+])
+
+
+def element_id(symbol: str) -> int:
+    """
+    Look up the atomic number of an element symbol.
+
+    Args:
+        symbol (str): Element symbol, e.g. "Cl"
+
+    Returns:
+        int: Atomic number, or 0 if the symbol is not an element
+    """
+    length = len(symbol)
+    if length == 1:
+        code = ord(symbol) << 8
+    elif length == 2:
+        code = (ord(symbol[0]) << 8) | ord(symbol[1])
+    else:
+        return 0
+    number = _SLOTS[(code * 7 + _DISPLACEMENTS[code % 39]) % 128]
+    return number if SYMBOLS[number] == symbol else 0
+
+
+def atomic_mass(symbol: str) -> float:
+    """
+    Look up the atomic mass of an element symbol.
+
+    Raises:
+        ValueError: If the symbol is not an element
+    """
+    number = element_id(symbol)
+    if not number:
+        raise ValueError(f"Unknown element: {symbol}")
+    return MASSES[number]
+
+
+def atomic_masses() -> Dict[str, float]:
+    """Return a symbol -> atomic mass mapping of all elements."""
+    return {SYMBOLS[number]: MASSES[number] for number in range(1, ELEMENT_COUNT + 1)}
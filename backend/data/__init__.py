@@ -1,9 +1,23 @@
 """
 Data package for ChemCalc backend.
 Contains database models, PubChem API integration, and data access layers.
+
+Exports are imported lazily so that e.g. `data.property_cache` can be used
+without importing `requests`.
 """
-from .pubchem_api import get_chemical_properties
+import importlib
+
+_EXPORTS = {
+    "get_chemical_properties": ".pubchem_api",
+    "fetch_chemical_properties": ".pubchem_api",
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    "get_chemical_properties"
-]
\ No newline at end of file
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
\ No newline at end of file
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from core.logging_config import get_logger
+
+
+logger = get_logger("circuit_breaker")
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the circuit breaker is open."""
+
+
+class LatencyTracker:
+    """Sliding window of recent call durations for percentile estimates."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        """Return the given quantile (0-1) of recent durations, or None without enough samples."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker over a sliding window of calls.
+
+    A call counts as bad if it failed or took longer than `slow_call_seconds`.
+    When the share of bad calls in the window reaches `failure_rate`, the
+    breaker opens and rejects calls for `reset_timeout` seconds. It then lets
+    a single probe through (half-open): success closes it, failure reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 5.0,
+        window: int = 20,
+        min_calls: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self._outcomes = deque(maxlen=window)  # True for a bad (failed or slow) call
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a call may go through now (claims the probe slot when half-open)."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self, seconds: float) -> None:
+        if seconds > self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                logger.info("Circuit breaker '%s' closed after successful probe", self.name)
+                self._state = self.CLOSED
+                self._outcomes.clear()
+            self._probing = False
+            self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._probing = False
+            if self._state == self.HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(True)
+            if (self._state == self.CLOSED and len(self._outcomes) >= self.min_calls
+                    and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate):
+                self._trip()
+
+    def release(self) -> None:
+        """Give up a call without judging it, e.g. when the caller's own deadline ran out."""
+        with self._lock:
+            self._probing = False
+
+    def _trip(self) -> None:
+        logger.warning("Circuit breaker '%s' opened for %ss", self.name, self.reset_timeout)
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
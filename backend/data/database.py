@@ -8,10 +8,14 @@ import os
 import re
 import time
 
+from core.logging_config import get_logger
+
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = get_logger("database")
+
 # Database connection handling with support for Render
 database_url = os.getenv("DATABASE_URL", "")
 
@@ -56,7 +60,7 @@ if '@' in masked_url:
         # Has username and password
         masked_url = prefix_parts[0] + ':' + prefix_parts[1] + ':******@' + parts[1]
 
-print(f"Connecting to database with: {masked_url}")
+logger.info("Connecting to database with: %s", masked_url)
 
 # Create SQLAlchemy engine with proper error handling
 try:
@@ -80,7 +84,7 @@ try:
                     # Has username and password
                     masked_url = prefix_parts[0] + ':' + prefix_parts[1] + ':******@' + parts[1]
             
-            print(f"Fixed malformed connection string. New connection string: {masked_url}")
+            logger.warning("Fixed malformed connection string. New connection string: %s", masked_url)
     
     # Add connection pooling and retry options for better reliability in cloud environments
     connect_args = {}
@@ -94,15 +98,15 @@ try:
         connect_args=connect_args
     )
 except Exception as e:
-    print(f"Error creating database engine: {str(e)}")
-    print(f"Attempting to create engine with basic configuration")
+    logger.error("Error creating database engine: %s", e)
+    logger.info("Attempting to create engine with basic configuration")
     # Fall back to a simpler configuration if the advanced one fails
     try:
         engine = create_engine(SQLALCHEMY_DATABASE_URL)
     except Exception as e2:
-        print(f"Second attempt failed: {str(e2)}")
+        logger.error("Second attempt failed: %s", e2)
         # Last resort - try with a local SQLite database
-        print("Falling back to SQLite database")
+        logger.warning("Falling back to SQLite database")
         engine = create_engine('sqlite:///./fallback.db')
 
 # Create a session factory
@@ -140,30 +144,30 @@ def create_tables():
                         conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {db_name}"))
                     temp_engine.dispose()
                 except SQLAlchemyError as db_err:
-                    print(f"Could not create database (this is often normal): {str(db_err)}")
+                    logger.info("Could not create database (this is often normal): %s", db_err)
             
             # Now create the tables
             Base.metadata.create_all(bind=engine)
-            print(f"Database tables created successfully using connection: {SQLALCHEMY_DATABASE_URL}")
+            logger.info("Database tables created successfully using connection: %s", SQLALCHEMY_DATABASE_URL)
             return
             
         except OperationalError as oe:
             retry_count += 1
             if retry_count >= max_retries:
-                print(f"Failed to create database tables after {max_retries} attempts: {str(oe)}")
+                logger.error("Failed to create database tables after %d attempts: %s", max_retries, oe)
                 if os.getenv("ENVIRONMENT") != "production":
                     raise
                 return
             
             # Wait with exponential backoff before retrying
             wait_time = 2 ** retry_count
-            print(f"Database connection failed. Retrying in {wait_time} seconds... (Attempt {retry_count}/{max_retries})")
+            logger.warning("Database connection failed. Retrying in %d seconds... (Attempt %d/%d)", wait_time, retry_count, max_retries)
             time.sleep(wait_time)
             
         except Exception as e:
-            print(f"Failed to create database tables: {str(e)}")
-            print(f"Connection string used: {SQLALCHEMY_DATABASE_URL}")
-            print("Please check your database connection settings and ensure the database is running")
+            logger.error("Failed to create database tables: %s", e)
+            logger.error("Connection string used: %s", SQLALCHEMY_DATABASE_URL)
+            logger.error("Please check your database connection settings and ensure the database is running")
             
             # Don't raise the exception in production to allow the API to start anyway
             if os.getenv("ENVIRONMENT") != "production":
@@ -0,0 +1,264 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to process-local locking
+    fcntl = None
+
+from core import settings
+from core.logging_config import get_logger
+
+
+logger = get_logger("cache")
+
+# Keys of a cached property dict (the PubChem columns of a history entry)
+PROPERTY_COLUMNS = (
+    "boiling_point",
+    "melting_point",
+    "density",
+    "state_at_room_temp",
+    "iupac_name",
+    "hazard_classification",
+    "structure_image_url",
+    "structure_image_svg_url",
+    "compound_url",
+)
+
+
+# File layout:
+#   header  | bucket 0 | bucket 1 | ... | bucket n-1
+# Each bucket holds a CLOCK hand followed by `ways` fixed-size slots:
+#   seq (uint32) | ref (uint8) | pad | key hash (uint64) | key len (uint16) | pad | value len (uint32)
+#   | stored at (uint32, unix seconds) | key | value
+# `seq` is a per-slot sequence lock: writers make it odd while a slot is being
+# rewritten, so readers never need a lock and simply retry/miss on a torn read.
+# The file is never truncated once created, since other processes may have it
+# mapped; a different layout or geometry lives in a different file (see cache_path).
+_MAGIC = b"CHEMPC02"
+_HEADER = struct.Struct("<8sIII")
+_HEADER_SIZE = 64
+_BUCKET_HEADER = struct.Struct("<I")
+_BUCKET_HEADER_SIZE = 8
+_SLOT_HEADER = struct.Struct("<IB3xQH2xII")
+_SEQ = struct.Struct("<I")
+_REF_OFFSET = 4
+_LOCK_STRIPES = 64
+
+
+class SharedPropertyCache:
+    """
+    Fixed-size property cache shared by all worker processes on a host.
+
+    Entries live in an mmap'd file split into set-associative buckets with
+    CLOCK eviction, so the total memory is bounded by the file size no matter
+    how many formulas are stored or how many workers attach to it.
+    """
+
+    def __init__(self, path: str, buckets: int, ways: int, slot_size: int, ttl_seconds: float = 0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.buckets = buckets
+        self.ways = ways
+        self.slot_size = slot_size
+        self.bucket_size = _BUCKET_HEADER_SIZE + ways * slot_size
+        self.size = _HEADER_SIZE + buckets * self.bucket_size
+        self._stripes = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._initialize_file()
+        except OSError:
+            os.close(self._fd)
+            raise
+        self._mm = mmap.mmap(self._fd, self.size)
+
+    def _initialize_file(self) -> None:
+        """
+        Size and stamp a new backing file, or check that an existing one matches.
+
+        An existing file is never shrunk or reset: other processes may have it
+        mapped and would crash (SIGBUS) or read garbage.
+
+        Raises:
+            OSError: If the file exists with a different layout or geometry
+        """
+        if fcntl:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, _HEADER_SIZE, 0)
+        try:
+            expected = _HEADER.pack(_MAGIC, self.buckets, self.ways, self.slot_size)
+            if os.fstat(self._fd).st_size == 0:
+                os.ftruncate(self._fd, self.size)
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, expected)
+                return
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            header = os.read(self._fd, _HEADER.size)
+            if header != expected or os.fstat(self._fd).st_size != self.size:
+                raise OSError(f"Cache file {self.path} has a different layout, leaving it untouched")
+        finally:
+            if fcntl:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, _HEADER_SIZE, 0)
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+    def _bucket_offset(self, key_hash: int) -> int:
+        return _HEADER_SIZE + (key_hash % self.buckets) * self.bucket_size
+
+    def _slot_offset(self, bucket_offset: int, way: int) -> int:
+        return bucket_offset + _BUCKET_HEADER_SIZE + way * self.slot_size
+
+    def get(self, formula: str) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Look up cached properties for a formula without taking any lock.
+
+        Returns:
+            Optional[Dict]: The cached property dict, or None on a miss or
+            when the entry is older than the TTL
+        """
+        key = formula.encode("utf-8")
+        key_hash = self._hash(key)
+        bucket = self._bucket_offset(key_hash)
+        mm = self._mm
+        oldest = time.time() - self.ttl_seconds if self.ttl_seconds > 0 else 0
+
+        for way in range(self.ways):
+            offset = self._slot_offset(bucket, way)
+            seq, _, slot_hash, key_len, value_len, stored_at = _SLOT_HEADER.unpack_from(mm, offset)
+            if seq & 1 or slot_hash != key_hash:
+                continue
+
+            data_start = offset + _SLOT_HEADER.size
+            slot_key = mm[data_start:data_start + key_len]
+            value = mm[data_start + key_len:data_start + key_len + value_len]
+            if _SEQ.unpack_from(mm, offset)[0] != seq or slot_key != key:
+                continue
+            if stored_at < oldest:
+                return None  # Expired; the next set() for this formula overwrites the slot
+
+            mm[offset + _REF_OFFSET] = 1
+            try:
+                return json.loads(value)
+            except ValueError:
+                return None
+
+        return None
+
+    def set(self, formula: str, properties: Dict[str, Optional[str]]) -> bool:
+        """
+        Store properties for a formula, evicting a cold entry if needed.
+
+        Returns:
+            bool: False if the serialized entry does not fit in a slot
+        """
+        key = formula.encode("utf-8")
+        value = json.dumps(properties, separators=(",", ":")).encode("utf-8")
+        if _SLOT_HEADER.size + len(key) + len(value) > self.slot_size:
+            return False
+
+        key_hash = self._hash(key)
+        bucket = self._bucket_offset(key_hash)
+
+        with self._stripes[(key_hash % self.buckets) % _LOCK_STRIPES]:
+            if fcntl:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, self.bucket_size, bucket)
+            try:
+                offset = self._find_slot(bucket, key_hash, key)
+                seq = _SEQ.unpack_from(self._mm, offset)[0]
+                _SEQ.pack_into(self._mm, offset, seq + 1)
+
+                data_start = offset + _SLOT_HEADER.size
+                self._mm[data_start:data_start + len(key)] = key
+                self._mm[data_start + len(key):data_start + len(key) + len(value)] = value
+                _SLOT_HEADER.pack_into(self._mm, offset, seq + 1, 1, key_hash, len(key), len(value), int(time.time()))
+
+                _SEQ.pack_into(self._mm, offset, seq + 2)
+            finally:
+                if fcntl:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, self.bucket_size, bucket)
+
+        return True
+
+    def _find_slot(self, bucket: int, key_hash: int, key: bytes) -> int:
+        """Pick the slot to write: same key, then an empty slot, then a CLOCK victim."""
+        mm = self._mm
+        for way in range(self.ways):
+            offset = self._slot_offset(bucket, way)
+            seq, _, slot_hash, key_len, _, _ = _SLOT_HEADER.unpack_from(mm, offset)
+            if seq == 0:
+                return offset
+            data_start = offset + _SLOT_HEADER.size
+            if slot_hash == key_hash and mm[data_start:data_start + key_len] == key:
+                return offset
+
+        hand = _BUCKET_HEADER.unpack_from(mm, bucket)[0] % self.ways
+        while True:
+            offset = self._slot_offset(bucket, hand)
+            hand = (hand + 1) % self.ways
+            if mm[offset + _REF_OFFSET]:
+                mm[offset + _REF_OFFSET] = 0
+                continue
+            _BUCKET_HEADER.pack_into(mm, bucket, hand)
+            return offset
+
+    def close(self) -> None:
+        """Unmap the cache file."""
+        self._mm.close()
+        os.close(self._fd)
+
+
+def cache_path() -> str:
+    """
+    Backing file for the configured cache layout.
+
+    The layout version and geometry are part of the name, so processes with
+    different settings (or code versions) use separate files instead of
+    resizing one another's mapping.
+    """
+    return "{}.{}-{}x{}x{}".format(
+        settings.PROPERTY_CACHE_PATH,
+        _MAGIC[-2:].decode(),
+        settings.PROPERTY_CACHE_BUCKETS,
+        settings.PROPERTY_CACHE_WAYS,
+        settings.PROPERTY_CACHE_SLOT_SIZE,
+    )
+
+
+_cache: Optional[SharedPropertyCache] = None
+_cache_lock = threading.Lock()
+_cache_failed = False
+
+
+def get_property_cache() -> Optional[SharedPropertyCache]:
+    """
+    Return the process-wide handle to the shared property cache.
+
+    Returns None when the cache is disabled or its file cannot be opened,
+    in which case callers simply go to PubChem.
+    """
+    global _cache, _cache_failed
+    if _cache is not None or _cache_failed or not settings.PROPERTY_CACHE_ENABLED:
+        return _cache
+
+    with _cache_lock:
+        if _cache is None and not _cache_failed:
+            try:
+                _cache = SharedPropertyCache(
+                    cache_path(),
+                    settings.PROPERTY_CACHE_BUCKETS,
+                    settings.PROPERTY_CACHE_WAYS,
+                    settings.PROPERTY_CACHE_SLOT_SIZE,
+                    settings.PROPERTY_CACHE_TTL_SECONDS,
+                )
+            except OSError as e:
+                logger.warning("Shared property cache disabled: %s", e)
+                _cache_failed = True
+    return _cache
@@ -1,9 +1,163 @@
 import requests
-from typing import Dict, Optional
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional, Tuple
 import time
 
+from core import settings
+from core.logging_config import get_logger
+from utils import Deadline, DeadlineExceeded, stage
+from .circuit_breaker import CircuitBreaker, CircuitOpenError, LatencyTracker
+from .property_cache import get_property_cache
+
+
+logger = get_logger("pubchem")
+
+
+_breaker = CircuitBreaker(
+    "pubchem",
+    failure_rate=settings.PUBCHEM_BREAKER_FAILURE_RATE,
+    slow_call_seconds=settings.PUBCHEM_SLOW_CALL_SECONDS,
+    window=settings.PUBCHEM_BREAKER_WINDOW,
+    min_calls=settings.PUBCHEM_BREAKER_MIN_CALLS,
+    reset_timeout=settings.PUBCHEM_BREAKER_RESET_TIMEOUT
+)
+_latency = LatencyTracker()
+_executor = ThreadPoolExecutor(max_workers=settings.PUBCHEM_MAX_CONCURRENCY, thread_name_prefix="pubchem")
+
+
+def _timed_get(url: str, timeout: float, deadline: Deadline):
+    # The budget is checked when a worker picks the call up, not when it was queued:
+    # calls that waited behind slow ones must neither run over nor start too late
+    timeout = deadline.timeout(timeout)
+    if timeout <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {url} left the queue")
+    start = time.monotonic()
+    response = requests.get(url, timeout=timeout)
+    return response, time.monotonic() - start
+
+
+def _hedge_delay() -> float:
+    """Seconds after which a call is hedged: the recent latency quantile, or a default until it is known."""
+    return _latency.percentile(settings.PUBCHEM_HEDGE_QUANTILE) or settings.PUBCHEM_HEDGE_DELAY_DEFAULT
+
+
+def _hedged_get(url: str, timeout: float, deadline: Deadline) -> requests.Response:
+    """
+    GET with a hedge: if the first request outlives the recent latency quantile,
+    a second identical request is sent and whichever answers first wins.
+    """
+    hedge_after = _hedge_delay()
+    pending = {_executor.submit(_timed_get, url, timeout, deadline)}
+    done, _ = wait(pending, timeout=min(hedge_after, timeout))
+    hedge_timeout = deadline.timeout(timeout)
+    if not done and hedge_timeout > 0:  # requests rejects a zero timeout
+        pending.add(_executor.submit(_timed_get, url, hedge_timeout, deadline))
+    
+    error = None
+    while pending:
+        remaining = deadline.remaining()
+        done, pending = wait(pending, timeout=None if remaining == float("inf") else remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceeded(f"Deadline exceeded waiting for {url}")
+        for future in done:
+            try:
+                response, elapsed = future.result()
+            except requests.exceptions.RequestException as e:
+                error = e
+                continue
+            _latency.record(elapsed)
+            return response  # A losing hedge finishes in the background and is ignored
+    raise error
+
+
+def _judge_cut_short(elapsed: float) -> None:
+    """
+    Judge a call our own deadline cut short.
+
+    A call that was already past the hedge point or the slow-call threshold
+    is slow whatever the deadline, so it counts as a failure; otherwise the
+    short budget says nothing about PubChem's health and the call is released.
+    """
+    if elapsed >= min(_hedge_delay(), settings.PUBCHEM_SLOW_CALL_SECONDS):
+        _breaker.record_failure()
+    else:
+        _breaker.release()
+
+
+def _pubchem_get(
+    url: str,
+    timeout: float,
+    deadline: Optional[Deadline] = None,
+    stage_name: str = "pubchem"
+) -> requests.Response:
+    """GET a PubChem URL through the circuit breaker, within the caller's deadline."""
+    deadline = deadline or Deadline()
+    if deadline.timeout(timeout) <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before requesting {url}")
+    if not _breaker.allow_request():
+        raise CircuitOpenError("PubChem circuit breaker is open")
+    
+    start = time.monotonic()
+    try:
+        with stage(stage_name):
+            response = _hedged_get(url, deadline.timeout(timeout), deadline)
+    except DeadlineExceeded:
+        _judge_cut_short(time.monotonic() - start)
+        raise
+    except requests.exceptions.RequestException as e:
+        if deadline.expired():
+            _judge_cut_short(time.monotonic() - start)
+            raise DeadlineExceeded(f"Deadline exceeded requesting {url}") from e
+        _breaker.record_failure()
+        raise
+    except BaseException:
+        # Anything else is our own bug, not PubChem's; never leave a half-open probe claimed
+        _breaker.release()
+        raise
+    
+    # 404 is a valid answer; server errors and throttling count against PubChem
+    if response.status_code >= 500 or response.status_code == 429:
+        _breaker.record_failure()
+    else:
+        _breaker.record_success(time.monotonic() - start)
+    return response
+
+
+def _pause(seconds: float, deadline: Deadline) -> None:
+    """Politeness delay between PubChem calls, never longer than the remaining budget."""
+    time.sleep(deadline.timeout(seconds))
+
 
 def get_chemical_properties(formula: str) -> Dict[str, Optional[str]]:
+    """Fetch PubChem properties within the longest allowed request deadline."""
+    return fetch_chemical_properties(formula, Deadline.from_ms(settings.REQUEST_DEADLINE_MAX_MS))[0]
+
+
+def fetch_chemical_properties(
+    formula: str,
+    deadline: Optional[Deadline] = None
+) -> Tuple[Dict[str, Optional[str]], bool]:
+    """
+    Fetch PubChem properties for a formula, stopping when the deadline runs out.
+    
+    Args:
+        formula (str): Chemical formula
+        deadline (Deadline): Remaining request budget (None waits as long as PubChem needs)
+        
+    Returns:
+        Tuple[Dict[str, Optional[str]], bool]: The properties gathered so far and
+        whether the lookup finished (False if the deadline cut it short or
+        PubChem was unavailable)
+    """
+    deadline = deadline or Deadline()
+    
+    # Serve from the cross-worker cache when another worker already asked PubChem
+    cache = get_property_cache()
+    if cache is not None:
+        cached = cache.get(formula)
+        if cached is not None:
+            return cached, True
+    
     # Initialize empty properties dict
     properties = {
         "boiling_point": None,
@@ -21,26 +175,34 @@ def get_chemical_properties(formula: str) -> Dict[str, Optional[str]]:
         # First, get the compound ID from the formula
         search_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/formula/{formula}/cids/JSON"
         
-        response = requests.get(search_url, timeout=10)
+        response = _pubchem_get(search_url, timeout=10, deadline=deadline, stage_name="pubchem.search")
         if response.status_code != 200:
-            print(f"PubChem search failed for formula {formula}: {response.status_code}")
-            return properties
+            logger.info("PubChem search failed for formula %s: %s", formula, response.status_code)
+            # 404 is PubChem's definitive "no such formula", so remember it too
+            if response.status_code == 404 and cache is not None:
+                cache.set(formula, properties)
+            # Anything but "not found" (throttling, server errors) leaves the lookup unfinished
+            return properties, response.status_code == 404
         
         search_data = response.json()
         if 'IdentifierList' not in search_data or 'CID' not in search_data['IdentifierList']:
-            print(f"No compound found for formula {formula}")
-            return properties
+            logger.info("No compound found for formula %s", formula)
+            if cache is not None:
+                cache.set(formula, properties)
+            return properties, True
         
         # Get the first CID (compound ID)
         cid = search_data['IdentifierList']['CID'][0]
         
         # Add a small delay to be respectful to the API
-        time.sleep(0.1)
+        _pause(0.1, deadline)
         
         # Get detailed compound information
         compound_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug/compound/cid/{cid}/property/MolecularFormula,MolecularWeight,IUPACName/JSON"
         
-        response = requests.get(compound_url, timeout=10)
+        response = _pubchem_get(compound_url, timeout=10, deadline=deadline, stage_name="pubchem.properties")
+        # Only definitive answers are cached; a throttled or failed sub-call is retried next time
+        definitive = response.status_code in (200, 404)
         if response.status_code == 200:
             compound_data = response.json()
             if 'PropertyTable' in compound_data and 'Properties' in compound_data['PropertyTable']:
@@ -53,11 +215,12 @@ def get_chemical_properties(formula: str) -> Dict[str, Optional[str]]:
         properties['compound_url'] = f"https://pubchem.ncbi.nlm.nih.gov/compound/{cid}"
         
         # Try to get additional properties like melting point, boiling point, etc.
-        time.sleep(0.1)  # Be respectful to the API
+        _pause(0.1, deadline)  # Be respectful to the API
         
         experimental_url = f"https://pubchem.ncbi.nlm.nih.gov/rest/pug_view/data/compound/{cid}/JSON"
         
-        response = requests.get(experimental_url, timeout=15)
+        response = _pubchem_get(experimental_url, timeout=15, deadline=deadline, stage_name="pubchem.experimental")
+        definitive = definitive and response.status_code in (200, 404)
         if response.status_code == 200:
             try:
                 exp_data = response.json()
@@ -70,18 +233,32 @@ def get_chemical_properties(formula: str) -> Dict[str, Optional[str]]:
                             _extract_properties_from_section(section, properties)
                             
             except Exception as e:
-                print(f"Error parsing experimental data for {formula}: {str(e)}")
+                logger.warning("Error parsing experimental data for %s: %s", formula, e)
+        
+        logger.info("Successfully fetched properties for %s (CID: %s)", formula, cid)
         
-        print(f"Successfully fetched properties for {formula} (CID: {cid})")
+        if cache is not None and definitive:
+            cache.set(formula, properties)
         
+    except DeadlineExceeded:
+        # Return what arrived in time; the caller decides whether to finish in the background
+        logger.info("Deadline exceeded fetching properties for %s, returning partial result", formula)
+        return properties, False
+    except CircuitOpenError:
+        # Degraded enrichment: return what we have (not cached, so it is fetched again on recovery)
+        logger.info("PubChem unavailable (circuit open), skipping properties for %s", formula)
+        return properties, False
     except requests.exceptions.Timeout:
-        print(f"PubChem API timeout for formula {formula}")
+        logger.warning("PubChem API timeout for formula %s", formula)
+        return properties, False
     except requests.exceptions.RequestException as e:
-        print(f"PubChem API request failed for formula {formula}: {str(e)}")
+        logger.warning("PubChem API request failed for formula %s: %s", formula, e)
+        return properties, False
     except Exception as e:
-        print(f"Unexpected error fetching properties for {formula}: {str(e)}")
+        logger.exception("Unexpected error fetching properties for %s: %s", formula, e)
+        return properties, False
     
-    return properties
+    return properties, True
 
 
 def _extract_properties_from_section(section: Dict, properties: Dict[str, Optional[str]]) -> None:
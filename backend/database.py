@@ -8,10 +8,14 @@ import os
 import re
 import time
 
+from core.logging_config import get_logger
+
 
 # Load environment variables from .env file
 load_dotenv()
 
+logger = get_logger("database")
+
 # Database connection handling with support for Render
 database_url = os.getenv("DATABASE_URL", "")
 
@@ -56,7 +60,7 @@ if '@' in masked_url:
         # Has username and password
         masked_url = prefix_parts[0] + ':' + prefix_parts[1] + ':******@' + parts[1]
 
-print(f"Connecting to database with: {masked_url}")
+logger.info("Connecting to database with: %s", masked_url)
 
 # Create SQLAlchemy engine with proper error handling
 try:
@@ -80,7 +84,7 @@ try:
                     # Has username and password
                     masked_url = prefix_parts[0] + ':' + prefix_parts[1] + ':******@' + parts[1]
             
-            print(f"Fixed malformed connection string. New connection string: {masked_url}")
+            logger.warning("Fixed malformed connection string. New connection string: %s", masked_url)
     
     # Add connection pooling and retry options for better reliability in cloud environments
     connect_args = {}
@@ -94,15 +98,15 @@ try:
         connect_args=connect_args
     )
 except Exception as e:
-    print(f"Error creating database engine: {str(e)}")
-    print(f"Attempting to create engine with basic configuration")
+    logger.error("Error creating database engine: %s", e)
+    logger.info("Attempting to create engine with basic configuration")
     # Fall back to a simpler configuration if the advanced one fails
     try:
         engine = create_engine(SQLALCHEMY_DATABASE_URL)
     except Exception as e2:
-        print(f"Second attempt failed: {str(e2)}")
+        logger.error("Second attempt failed: %s", e2)
         # Last resort - try with a local SQLite database
-        print("Falling back to SQLite database")
+        logger.warning("Falling back to SQLite database")
         engine = create_engine('sqlite:///./fallback.db')
 
 # Create a session factory
@@ -114,22 +118,55 @@ Base = declarative_base()
 # Formula history model
 class FormulaHistory(Base):
     __tablename__ = "formulas"
+    # Never reuse IDs on SQLite, where old rows are moved out into per-month tables
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     formula = Column(String(100), index=True)
     molar_mass = Column(Float)
-    timestamp = Column(DateTime, default=func.now())
-    user_ip = Column(String(45), nullable=True)  # IPv6 addresses can be long
+    timestamp = Column(DateTime, default=func.now(), index=True)  # partitioning key
+    user_ip = Column(String(45), nullable=True, index=True)  # IPv6 addresses can be long
     boiling_point = Column(String(100), nullable=True)
     melting_point = Column(String(100), nullable=True)
     density = Column(String(100), nullable=True)
     state_at_room_temp = Column(String(50), nullable=True)
-    iupac_name = Column(String(255), nullable=True)
+    iupac_name = Column(String(255), nullable=True, index=True)
     hazard_classification = Column(String(255), nullable=True)
     structure_image_url = Column(String(255), nullable=True)
     structure_image_svg_url = Column(String(255), nullable=True)
     compound_url = Column(String(255), nullable=True)
 
+# Search indexes, keyed by distinct formula/name so they stay small and are
+# unaffected by history deletes and partition drops
+class FormulaElement(Base):
+    __tablename__ = "formula_elements"
+
+    element = Column(String(3), primary_key=True)
+    formula = Column(String(100), primary_key=True)
+
+class CompoundName(Base):
+    __tablename__ = "compound_names"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(255), unique=True, nullable=False)  # full-text indexed, see search_service
+
+# Analytics rollups, incremented in the same transaction as each history write
+class FormulaUsageRollup(Base):
+    __tablename__ = "formula_usage_rollups"
+
+    granularity = Column(String(4), primary_key=True)  # 'hour' or 'day'
+    bucket_start = Column(DateTime, primary_key=True)
+    formula = Column(String(100), primary_key=True)
+    calculations = Column(Integer, nullable=False, default=0)
+
+class ClientUsageRollup(Base):
+    __tablename__ = "client_usage_rollups"
+
+    granularity = Column(String(4), primary_key=True)  # 'hour' or 'day'
+    bucket_start = Column(DateTime, primary_key=True)
+    client = Column(String(45), primary_key=True)  # '' when the client IP is unknown
+    calculations = Column(Integer, nullable=False, default=0)
+
 # Function to create all tables
 def create_tables():
     max_retries = 5
@@ -157,30 +194,30 @@ def create_tables():
                         conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {db_name}"))
                     temp_engine.dispose()
                 except SQLAlchemyError as db_err:
-                    print(f"Could not create database (this is often normal): {str(db_err)}")
+                    logger.info("Could not create database (this is often normal): %s", db_err)
             
             # Now create the tables
             Base.metadata.create_all(bind=engine)
-            print(f"Database tables created successfully using connection: {SQLALCHEMY_DATABASE_URL}")
+            logger.info("Database tables created successfully using connection: %s", SQLALCHEMY_DATABASE_URL)
             return
             
         except OperationalError as oe:
             retry_count += 1
             if retry_count >= max_retries:
-                print(f"Failed to create database tables after {max_retries} attempts: {str(oe)}")
+                logger.error("Failed to create database tables after %d attempts: %s", max_retries, oe)
                 if os.getenv("ENVIRONMENT") != "production":
                     raise
                 return
             
             # Wait with exponential backoff before retrying
             wait_time = 2 ** retry_count
-            print(f"Database connection failed. Retrying in {wait_time} seconds... (Attempt {retry_count}/{max_retries})")
+            logger.warning("Database connection failed. Retrying in %d seconds... (Attempt %d/%d)", wait_time, retry_count, max_retries)
             time.sleep(wait_time)
             
         except Exception as e:
-            print(f"Failed to create database tables: {str(e)}")
-            print(f"Connection string used: {SQLALCHEMY_DATABASE_URL}")
-            print("Please check your database connection settings and ensure the database is running")
+            logger.error("Failed to create database tables: %s", e)
+            logger.error("Connection string used: %s", SQLALCHEMY_DATABASE_URL)
+            logger.error("Please check your database connection settings and ensure the database is running")
             
             # Don't raise the exception in production to allow the API to start anyway
             if os.getenv("ENVIRONMENT") != "production":
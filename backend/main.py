@@ -3,8 +3,13 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from api import router
-from core import settings
-from database import create_tables
+from core import settings, get_logger, RequestIdMiddleware
+from database import create_tables, engine
+from services import ensure_search_indexes, start_cache_warmup, start_partition_maintenance
+from utils import ProfilingMiddleware
+
+
+logger = get_logger("main")
 
 
 def create_app() -> FastAPI:
@@ -23,6 +28,13 @@ def create_app() -> FastAPI:
         allow_headers=settings.CORS_HEADERS,
     )
     
+    # Request tracing for /admin/slow-requests (opt-in, adds no middleware when disabled)
+    if settings.PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware)
+    
+    # Tag every log line of a request with its ID
+    app.add_middleware(RequestIdMiddleware)
+    
     # Include API routes
     app.include_router(router)
     
@@ -41,18 +53,36 @@ def startup_db_client():
     """
     try:
         create_tables()
-        print("Database tables created successfully")
+        logger.info("Database tables created successfully")
     except Exception as e:
-        print(f"Warning: Could not create database tables: {str(e)}")
-        print("The API will still work without database functionality")
+        logger.warning("Could not create database tables: %s", e)
+        logger.warning("The API will still work without database functionality")
         
         # When running locally, provide more helpful error messages
         if not os.environ.get('ENVIRONMENT') == 'production':
             if 'mysql' in str(e):
-                print("\nTROUBLESHOOTING TIPS:")
-                print("1. Make sure MySQL is running locally")
-                print("2. Check that you can connect to MySQL with the credentials in your connection string")
-                print("3. If you're using Docker, make sure the MySQL container is running")
-                print("4. If you're running the app locally outside Docker but trying to connect to MySQL in Docker,")
-                print("   update your connection string to use 'localhost' instead of 'mysql'")
-                print("5. Try manually creating the database: CREATE DATABASE molar_mass_db;\n")
\ No newline at end of file
+                logger.warning(
+                    "TROUBLESHOOTING TIPS:\n"
+                    "1. Make sure MySQL is running locally\n"
+                    "2. Check that you can connect to MySQL with the credentials in your connection string\n"
+                    "3. If you're using Docker, make sure the MySQL container is running\n"
+                    "4. If you're running the app locally outside Docker but trying to connect to MySQL in Docker,\n"
+                    "   update your connection string to use 'localhost' instead of 'mysql'\n"
+                    "5. Try manually creating the database: CREATE DATABASE molar_mass_db;"
+                )
+    
+    # Each remaining step fails on its own, so one problem never skips the others
+    try:
+        ensure_search_indexes(engine)
+    except Exception as e:
+        logger.warning("Could not create the compound name search index (name search falls back to LIKE): %s", e)
+    
+    try:
+        start_partition_maintenance()
+    except Exception as e:
+        logger.warning("Could not start history partition maintenance: %s", e)
+    
+    try:
+        start_cache_warmup()
+    except Exception as e:
+        logger.warning("Could not start cache warm-up: %s", e)
@@ -2,10 +2,46 @@
 Models package for ChemCalc backend.
 Contains Pydantic schemas and SQLAlchemy models.
 """
-from .schemas import FormulaRequest, FormulaResponse, FormulaHistoryModel
+from .schemas import (
+    FormulaRequest,
+    FormulaResponse,
+    FormulaHistoryModel,
+    IsotopePatternRequest,
+    IsotopePeak,
+    IsotopePatternResponse,
+    EquationRequest,
+    EquationSpecies,
+    EquationResponse,
+    ElementRange,
+    FormulaSearchRequest,
+    FormulaCandidate,
+    FormulaSearchResponse,
+    HistorySelection,
+    BulkUpdateRequest,
+    BulkOperationResponse,
+    FormulaUsageStat,
+    CalculationBucketStat,
+    HistoryStatsSummary
+)
 
 __all__ = [
     "FormulaRequest", 
     "FormulaResponse", 
-    "FormulaHistoryModel"
+    "FormulaHistoryModel",
+    "IsotopePatternRequest",
+    "IsotopePeak",
+    "IsotopePatternResponse",
+    "EquationRequest",
+    "EquationSpecies",
+    "EquationResponse",
+    "ElementRange",
+    "FormulaSearchRequest",
+    "FormulaCandidate",
+    "FormulaSearchResponse",
+    "HistorySelection",
+    "BulkUpdateRequest",
+    "BulkOperationResponse",
+    "FormulaUsageStat",
+    "CalculationBucketStat",
+    "HistoryStatsSummary"
 ]
\ No newline at end of file
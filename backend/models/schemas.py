@@ -1,11 +1,12 @@
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
 
 
 class FormulaRequest(BaseModel):
     """Request model for formula calculation."""
     formula: str
+    deadline_ms: Optional[int] = None  #latency budget, the X-Request-Deadline-Ms header takes precedence
 
 
 class FormulaResponse(BaseModel):
@@ -22,6 +23,107 @@ class FormulaResponse(BaseModel):
     structure_image_url: Optional[str] = None
     structure_image_svg_url: Optional[str] = None
     compound_url: Optional[str] = None
+    partial: bool = False  #True if the deadline ran out before all properties were fetched
+
+
+class IsotopePatternRequest(BaseModel):
+    """Request model for isotope pattern calculation."""
+    formula: str
+    min_intensity: float = 0.01  #smallest peak to report, in % of the base peak
+
+
+class IsotopePeak(BaseModel):
+    """One nominal-mass peak of an isotope pattern."""
+    mass: float  #centroid exact mass
+    intensity: float  #relative to the base peak, in %
+    abundance: float  #absolute probability
+
+
+class IsotopePatternResponse(BaseModel):
+    """Response model for isotope pattern calculation."""
+    formula: str
+    monoisotopic_mass: float
+    average_mass: float
+    unit: str
+    peaks: List[IsotopePeak]
+
+
+class EquationRequest(BaseModel):
+    """Request model for balancing a chemical equation."""
+    equation: str  #e.g. "Fe + O2 -> Fe2O3"
+
+
+class EquationSpecies(BaseModel):
+    """One reactant or product of a balanced equation."""
+    formula: str
+    coefficient: int
+    molar_mass: float
+
+
+class EquationResponse(BaseModel):
+    """Response model for a balanced chemical equation."""
+    equation: str
+    reactants: List[EquationSpecies]
+    products: List[EquationSpecies]
+    unit: str = "g/mol"
+
+
+class ElementRange(BaseModel):
+    """Allowed count range of one element in a formula search."""
+    min: int = Field(0, ge=0)
+    max: Optional[int] = Field(None, ge=0)  #None means limited only by the target mass
+
+
+class FormulaSearchRequest(BaseModel):
+    """Request model for finding formulas that match a measured mass."""
+    target_mass: float
+    tolerance: float = 0.005  #absolute, in the unit of the mass
+    tolerance_ppm: Optional[float] = None  #overrides tolerance when given
+    elements: Optional[Dict[str, ElementRange]] = None  #defaults to CHNOPS
+    mass_type: str = "average"  #"average" or "monoisotopic"
+    max_results: int = 100
+    rdbe_min: Optional[float] = 0
+    rdbe_max: Optional[float] = None
+    valence_check: bool = True
+    timeout_ms: Optional[int] = None
+
+
+class FormulaCandidate(BaseModel):
+    """One composition matching the searched mass."""
+    formula: str
+    mass: float
+    error: float
+    error_ppm: float
+    rdbe: Optional[float] = None
+
+
+class FormulaSearchResponse(BaseModel):
+    """Response model for formula search, candidates sorted by mass error."""
+    target_mass: float
+    tolerance: float
+    mass_type: str
+    truncated: bool  #True if the time budget ran out before the search finished
+    candidates: List[FormulaCandidate]
+
+
+class HistorySelection(BaseModel):
+    """Selects history entries for bulk operations; all given criteria must match."""
+    ids: Optional[List[int]] = None
+    formula: Optional[str] = None
+    start: Optional[datetime] = None  #inclusive
+    end: Optional[datetime] = None  #exclusive
+    user_ip: Optional[str] = None
+
+
+class BulkUpdateRequest(HistorySelection):
+    """Bulk update: set a new formula, or only recompute molar masses when omitted."""
+    new_formula: Optional[str] = None
+
+
+class BulkOperationResponse(BaseModel):
+    """Result of a bulk update or delete."""
+    affected: int
+    skipped: int = 0  #entries left unchanged because their stored formula is invalid
 
 
 class FormulaHistoryModel(BaseModel):
@@ -44,3 +146,25 @@ class FormulaHistoryModel(BaseModel):
     class Config:
         """Pydantic configuration to allow ORM mode."""
         orm_mode = True
+
+
+class FormulaUsageStat(BaseModel):
+    """Calculation count of one formula within a time window."""
+    formula: str
+    calculations: int
+
+
+class CalculationBucketStat(BaseModel):
+    """Calculations and distinct clients within one hour or day."""
+    bucket_start: datetime
+    calculations: int
+    unique_clients: int
+
+
+class HistoryStatsSummary(BaseModel):
+    """Totals for a time window of the history rollups."""
+    since: datetime
+    until: datetime
+    calculations: int
+    unique_clients: int
+    unique_formulas: int
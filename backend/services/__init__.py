@@ -1,10 +1,55 @@
-from .formula_service import calculate_molar_mass, parse_formula
-from .history_service import save_to_database, update_formula_in_history, delete_formula_from_history
-
-__all__ = [
-    "calculate_molar_mass", 
-    "parse_formula", 
-    "save_to_database", 
-    "update_formula_in_history", 
-    "delete_formula_from_history"
-]
\ No newline at end of file
+"""
+Services package for ChemCalc backend.
+
+Exports are imported lazily on first access, so lightweight users such as
+the offline CLI can use `formula_service` without loading the database layer.
+"""
+import importlib
+
+_EXPORTS = {
+    "calculate_molar_mass": ".formula_service",
+    "parse_formula": ".formula_service",
+    "parse_formula_ids": ".formula_service",
+    "IncrementalFormulaParser": ".incremental_parser",
+    "search_formulas": ".decomposition_service",
+    "balance_equation": ".equation_service",
+    "calculate_isotope_pattern": ".isotope_service",
+    "calculate_monoisotopic_mass": ".isotope_service",
+    "save_to_database": ".history_service",
+    "get_recent_history": ".history_service",
+    "update_history_properties": ".history_service",
+    "update_formula_in_history": ".history_service",
+    "delete_formula_from_history": ".history_service",
+    "bulk_update_history": ".history_service",
+    "bulk_delete_history": ".history_service",
+    "history_tables": ".partition_service",
+    "maintain_history_partitions": ".partition_service",
+    "start_partition_maintenance": ".partition_service",
+    "export_history": ".export_service",
+    "import_history": ".export_service",
+    "EXPORT_FORMATS": ".export_service",
+    "search_history": ".search_service",
+    "ensure_search_indexes": ".search_service",
+    "rebuild_search_index": ".search_service",
+    "get_top_formulas": ".stats_service",
+    "get_calculation_series": ".stats_service",
+    "get_stats_summary": ".stats_service",
+    "rebuild_rollups": ".stats_service",
+    "start_cache_warmup": ".warmup_service",
+    "warm_caches": ".warmup_service",
+    "warmup_status": ".warmup_service",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,247 @@
+import heapq
+import math
+import time
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from core import settings
+from core.isotopes import most_abundant_isotope_mass
+
+
+# Elements searched when the request does not name any
+DEFAULT_ELEMENTS = ("C", "H", "N", "O", "P", "S")
+
+# Typical valences used for the RDBE and Senior's rule plausibility filters
+VALENCES = {
+    "H": 1, "Li": 1, "Na": 1, "K": 1, "F": 1, "Cl": 1, "Br": 1, "I": 1,
+    "O": 2, "S": 2, "Se": 2, "Mg": 2, "Ca": 2,
+    "B": 3, "N": 3, "P": 3, "As": 3,
+    "C": 4, "Si": 4,
+}
+
+# Integer masses are the real masses divided by a precision chosen so the
+# smallest element gets this many units; it bounds the residue table size.
+RESIDUES = 20000
+
+
+class _Timeout(Exception):
+    pass
+
+
+def _outward(first: int, last: int) -> Iterator[int]:
+    """Integers of [first, last] ordered by distance from the centre, generated lazily."""
+    centre = (first + last) // 2
+    yield centre
+    for offset in range(1, max(centre - first, last - centre) + 1):
+        if centre + offset <= last:
+            yield centre + offset
+        if centre - offset >= first:
+            yield centre - offset
+
+
+@lru_cache(maxsize=32)
+def _extended_residue_table(integer_masses: Tuple[int, ...]) -> Tuple[Tuple[float, ...], ...]:
+    """
+    Build the extended residue table with the round-robin algorithm (Böcker & Lipták).
+
+    Row i, column r holds the smallest integer congruent to r modulo the smallest
+    mass that can be written as a non-negative combination of the first i+1
+    masses (infinity if none). Looking up a residue then tells in O(1) whether
+    a remainder is decomposable at all, so the search never enters dead ends.
+    """
+    modulus = integer_masses[0]
+    row = [math.inf] * modulus
+    row[0] = 0
+    table = [tuple(row)]
+
+    for mass in integer_masses[1:]:
+        row = list(row)
+        step = math.gcd(modulus, mass)
+        for residue in range(step):
+            smallest = min(row[r] for r in range(residue, modulus, step))
+            if smallest == math.inf:
+                continue
+            for _ in range(modulus // step):
+                smallest += mass
+                r = smallest % modulus
+                if row[r] < smallest:
+                    smallest = row[r]
+                else:
+                    row[r] = smallest
+        table.append(tuple(row))
+
+    return tuple(table)
+
+
+def hill_formula(counts: Dict[str, int]) -> str:
+    """Write a composition in Hill order (C, H, then alphabetical)."""
+    elements = sorted(element for element, count in counts.items() if count)
+    if "C" in elements:
+        elements = ["C"] + (["H"] if "H" in elements else []) + [e for e in elements if e not in ("C", "H")]
+    return "".join(element + (str(counts[element]) if counts[element] > 1 else "") for element in elements)
+
+
+def _rdbe(counts: Dict[str, int]) -> Optional[float]:
+    """Ring and double bond equivalents, or None if an element has no known valence."""
+    if any(element not in VALENCES for element in counts if counts[element]):
+        return None
+    return 1 + sum(count * (VALENCES[element] - 2) for element, count in counts.items()) / 2
+
+
+def _satisfies_senior_rules(counts: Dict[str, int]) -> bool:
+    """Senior's rules for a connected, neutral, even-electron structure."""
+    atoms = sum(counts.values())
+    valences = [VALENCES[element] for element, count in counts.items() if count]
+    total = sum(VALENCES[element] * count for element, count in counts.items())
+    if atoms <= 1:
+        return True
+    return total % 2 == 0 and total >= 2 * max(valences) and total >= 2 * (atoms - 1)
+
+
+def search_formulas(
+    target_mass: float,
+    tolerance: float,
+    elements: Optional[Dict[str, Tuple[int, Optional[int]]]] = None,
+    mass_type: str = "average",
+    max_results: int = 100,
+    rdbe_min: Optional[float] = 0,
+    rdbe_max: Optional[float] = None,
+    valence_check: bool = True,
+    timeout_ms: Optional[int] = None
+) -> Tuple[List[Dict], bool]:
+    """
+    Find element compositions whose mass is within a tolerance of a target mass.
+
+    Candidates are enumerated with an extended residue table over integer-scaled
+    masses, then checked against the exact masses and the plausibility filters.
+
+    Args:
+        target_mass (float): Measured mass
+        tolerance (float): Allowed absolute mass error
+        elements: Element -> (min count, max count or None) constraints
+        mass_type (str): 'average' (settings.atomic_masses) or 'monoisotopic'
+        max_results (int): Number of best candidates to return
+        rdbe_min (float): Smallest allowed RDBE (None disables the check)
+        rdbe_max (float): Largest allowed RDBE (None disables the check)
+        valence_check (bool): Apply Senior's rules
+        timeout_ms (int): Search time budget (defaults to settings.FORMULA_SEARCH_TIMEOUT_MS)
+
+    Returns:
+        Tuple[List[Dict], bool]: Candidates sorted by absolute mass error, and
+        whether the search stopped early because the time budget ran out
+
+    Raises:
+        ValueError: If an element or mass type is unknown or the input is out of range
+    """
+    if target_mass <= 0 or tolerance < 0:
+        raise ValueError("Target mass must be positive and tolerance non-negative")
+    if tolerance > settings.FORMULA_SEARCH_MAX_TOLERANCE:
+        raise ValueError(f"Tolerance must not exceed {settings.FORMULA_SEARCH_MAX_TOLERANCE}")
+    if max_results < 1:
+        raise ValueError("max_results must be at least 1")
+    if timeout_ms is not None and timeout_ms < 1:
+        raise ValueError("timeout_ms must be positive")
+    if mass_type not in ("average", "monoisotopic"):
+        raise ValueError(f"Unknown mass type: {mass_type}")
+
+    constraints = elements or {element: (0, None) for element in DEFAULT_ELEMENTS}
+    if any((low or 0) < 0 or (high is not None and high < 0) for low, high in constraints.values()):
+        raise ValueError("Element counts must not be negative")
+    real_masses = {}
+    for element in constraints:
+        if element not in settings.atomic_masses:
+            raise ValueError(f"Unknown element: {element}")
+        real_masses[element] = (
+            settings.atomic_masses[element] if mass_type == "average" else most_abundant_isotope_mass(element)
+        )
+
+    # Fixed minimum counts are subtracted up front, the rest is decomposed
+    symbols = sorted(constraints, key=lambda element: real_masses[element])
+    minimums = [constraints[element][0] or 0 for element in symbols]
+    masses = [real_masses[element] for element in symbols]
+    fixed_mass = sum(count * mass for count, mass in zip(minimums, masses))
+    low = target_mass - tolerance - fixed_mass
+    high = target_mass + tolerance - fixed_mass
+    if high < 0:
+        return [], False
+    maximums = [
+        (constraints[element][1] if constraints[element][1] is not None else math.inf) - minimum
+        for element, minimum in zip(symbols, minimums)
+    ]
+    if any(maximum < 0 for maximum in maximums):
+        raise ValueError("Minimum element count exceeds maximum")
+
+    precision = masses[0] / RESIDUES
+    integer_masses = tuple(max(1, round(mass / precision)) for mass in masses)
+    table = _extended_residue_table(integer_masses)
+
+    # Rounding makes integer masses deviate from the real masses by a bounded relative error
+    errors = [(integer * precision - mass) / mass for integer, mass in zip(integer_masses, masses)]
+    bounds = [value * (1 + error) / precision for value in (max(low, 0), high) for error in (min(errors), max(errors))]
+    first, last = math.floor(min(bounds)), math.ceil(max(bounds))
+
+    deadline = time.monotonic() + (timeout_ms if timeout_ms is not None else settings.FORMULA_SEARCH_TIMEOUT_MS) / 1000
+    best = []  # heap of the best candidates so far, worst (largest error) on top
+    counts = [0] * len(symbols)
+    visited = [0]
+    modulus = integer_masses[0]
+
+    def emit():
+        composition = {element: count + minimum for element, count, minimum in zip(symbols, counts, minimums)}
+        mass = sum(composition[element] * real_masses[element] for element in symbols)
+        error = mass - target_mass
+        if abs(error) > tolerance or not any(composition.values()):
+            return
+        rdbe = _rdbe(composition)
+        if rdbe is not None:
+            if (rdbe_min is not None and rdbe < rdbe_min) or (rdbe_max is not None and rdbe > rdbe_max):
+                return
+            if valence_check and not _satisfies_senior_rules(composition):
+                return
+        candidate = (-abs(error), hill_formula(composition), mass, error, rdbe)
+        if len(best) < max_results:
+            heapq.heappush(best, candidate)
+        elif candidate > best[0]:
+            heapq.heapreplace(best, candidate)
+
+    def decompose(index: int, remainder: int):
+        visited[0] += 1
+        if visited[0] & 0x3FF == 0 and time.monotonic() > deadline:
+            raise _Timeout()
+        if index == 0:
+            if remainder % modulus == 0 and remainder // modulus <= maximums[0]:
+                counts[0] = remainder // modulus
+                emit()
+            return
+        mass = integer_masses[index]
+        previous = table[index - 1]
+        limit = min(remainder // mass, maximums[index])
+        for count in range(int(limit) + 1):
+            rest = remainder - count * mass
+            if previous[rest % modulus] <= rest:
+                counts[index] = count
+                decompose(index - 1, rest)
+        counts[index] = 0
+
+    truncated = False
+    try:
+        # Walk the window outwards from its centre so a timeout keeps the closest candidates
+        for integer_mass in _outward(max(first, 0), last):
+            if time.monotonic() > deadline:
+                raise _Timeout()
+            if table[-1][integer_mass % modulus] <= integer_mass:
+                decompose(len(symbols) - 1, integer_mass)
+    except _Timeout:
+        truncated = True
+
+    candidates = [
+        {
+            "formula": formula,
+            "mass": round(mass, 6),
+            "error": round(error, 6),
+            "error_ppm": round(error / target_mass * 1e6, 3),
+            "rdbe": rdbe
+        }
+        for _, formula, mass, error, rdbe in sorted(best, reverse=True)
+    ]
+    return candidates, truncated
@@ -0,0 +1,163 @@
+import re
+from fractions import Fraction
+from functools import lru_cache
+from math import gcd
+from typing import Dict, List, Tuple
+
+from .formula_service import calculate_molar_mass, parse_formula
+
+
+# Reaction arrows accepted between the two sides of an equation
+_ARROW = re.compile(r"\s*(?:<=>|<->|->|=>|→|⇌|=)\s*")
+# Optional leading coefficient and trailing state symbol around a species
+_SPECIES = re.compile(r"^(\d*)\s*(.+?)\s*(?:\((?:s|l|g|aq)\))?$")
+
+
+def _split_side(side: str) -> List[str]:
+    species = []
+    for term in side.split("+"):
+        term = term.strip()
+        if not term:
+            raise ValueError(f"Empty species in reaction side: {side}")
+        # Coefficients given by the user are ignored, balancing recomputes them
+        species.append(_SPECIES.match(term).group(2))
+    return species
+
+
+def parse_equation(equation: str) -> Tuple[List[str], List[str]]:
+    """
+    Split a reaction into reactant and product formulas.
+
+    Args:
+        equation (str): Reaction such as 'H2 + O2 -> H2O'
+
+    Returns:
+        Tuple[List[str], List[str]]: Reactant and product formulas
+
+    Raises:
+        ValueError: If the reaction does not have exactly two sides
+    """
+    sides = _ARROW.split(equation.strip())
+    if len(sides) != 2 or not sides[0] or not sides[1]:
+        raise ValueError(f"Invalid reaction format: {equation}")
+    return _split_side(sides[0]), _split_side(sides[1])
+
+
+def _composition(formula: str) -> Dict[str, int]:
+    counts = {}
+    for element, count in parse_formula(formula):
+        counts[element] = counts.get(element, 0) + count
+    return counts
+
+
+def _nullspace(matrix: List[List[Fraction]], columns: int) -> List[List[Fraction]]:
+    """Basis of the rational nullspace of `matrix` via reduced row echelon form."""
+    rows = [row[:] for row in matrix]
+    pivots = []
+    rank = 0
+    for col in range(columns):
+        pivot = next((r for r in range(rank, len(rows)) if rows[r][col]), None)
+        if pivot is None:
+            continue
+        rows[rank], rows[pivot] = rows[pivot], rows[rank]
+        lead = rows[rank][col]
+        rows[rank] = [value / lead for value in rows[rank]]
+        for r in range(len(rows)):
+            if r != rank and rows[r][col]:
+                factor = rows[r][col]
+                rows[r] = [a - factor * b for a, b in zip(rows[r], rows[rank])]
+        pivots.append(col)
+        rank += 1
+        if rank == len(rows):
+            break
+
+    basis = []
+    for free in (col for col in range(columns) if col not in pivots):
+        vector = [Fraction(0)] * columns
+        vector[free] = Fraction(1)
+        for row, col in enumerate(pivots):
+            vector[col] = -rows[row][free]
+        basis.append(vector)
+    return basis
+
+
+@lru_cache(maxsize=1024)
+def _balance(reactants: Tuple[str, ...], products: Tuple[str, ...]) -> Tuple[int, ...]:
+    """Smallest positive integer coefficients for a reaction in canonical (sorted) order."""
+    species = reactants + products
+    compositions = [_composition(formula) for formula in species]
+    elements = sorted({element for composition in compositions for element in composition})
+
+    # Element x species matrix; products count negatively so a balanced reaction is its nullspace
+    matrix = [
+        [Fraction(composition.get(element, 0) * (1 if index < len(reactants) else -1))
+         for index, composition in enumerate(compositions)]
+        for element in elements
+    ]
+    basis = _nullspace(matrix, len(species))
+    if not basis:
+        raise ValueError("Reaction cannot be balanced")
+    if len(basis) > 1:
+        raise ValueError("Reaction has no unique balance (it combines independent reactions)")
+
+    vector = basis[0]
+    scale = 1
+    for value in vector:
+        scale = scale * value.denominator // gcd(scale, value.denominator)
+    coefficients = [int(value * scale) for value in vector]
+    divisor = 0
+    for coefficient in coefficients:
+        divisor = gcd(divisor, coefficient)
+    coefficients = [coefficient // divisor for coefficient in coefficients]
+    if all(coefficient < 0 for coefficient in coefficients):
+        coefficients = [-coefficient for coefficient in coefficients]
+    if any(coefficient <= 0 for coefficient in coefficients):
+        raise ValueError("Reaction cannot be balanced with positive coefficients")
+    return tuple(coefficients)
+
+
+def _format_side(species: List[Dict]) -> str:
+    return " + ".join(
+        (str(entry["coefficient"]) if entry["coefficient"] > 1 else "") + entry["formula"]
+        for entry in species
+    )
+
+
+def balance_equation(equation: str) -> Dict:
+    """
+    Balance a chemical reaction with the smallest integer coefficients.
+
+    The element x species matrix is solved exactly over the rationals. Results
+    are cached by the canonical (sorted) reaction, so reorderings of the same
+    reaction share a cache entry.
+
+    Args:
+        equation (str): Unbalanced reaction such as 'Fe + O2 -> Fe2O3'
+
+    Returns:
+        Dict: Balanced equation string, and reactants and products with their
+        coefficients and molar masses
+
+    Raises:
+        ValueError: If the reaction is invalid or cannot be balanced uniquely
+    """
+    reactants, products = parse_equation(equation)
+    masses = {formula: round(calculate_molar_mass(formula), 4) for formula in reactants + products}
+
+    canonical_reactants = tuple(sorted(set(reactants)))
+    canonical_products = tuple(sorted(set(products)))
+    if len(canonical_reactants) != len(reactants) or len(canonical_products) != len(products):
+        raise ValueError("A species is listed more than once on the same side")
+    coefficients = dict(zip(
+        [("reactant", formula) for formula in canonical_reactants] + [("product", formula) for formula in canonical_products],
+        _balance(canonical_reactants, canonical_products)
+    ))
+
+    result = {}
+    for side, formulas in (("reactant", reactants), ("product", products)):
+        result[side + "s"] = [
+            {"formula": formula, "coefficient": coefficients[(side, formula)], "molar_mass": masses[formula]}
+            for formula in formulas
+        ]
+    result["equation"] = f"{_format_side(result['reactants'])} -> {_format_side(result['products'])}"
+    return result
@@ -0,0 +1,266 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterator, List
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet export/import is optional
+    pyarrow = None
+
+from database import FormulaHistory, SessionLocal
+from .formula_service import calculate_molar_mass
+from .partition_service import history_tables
+from .search_service import index_for_search
+from .stats_service import record_calculations
+
+
+# Client IPs stay out of exports, like they stay out of the history API; imports still accept them
+IMPORT_COLUMNS = [column.name for column in FormulaHistory.__table__.columns]
+EXPORT_COLUMNS = [column for column in IMPORT_COLUMNS if column != "user_ip"]
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_BATCH_SIZE = 5000
+IMPORT_BATCH_SIZE = 5000
+
+
+def _iter_history_batches(batch_size: int) -> Iterator[List]:
+    """
+    Stream every history row in batches using a server-side cursor.
+
+    Uses its own session because the response body is produced after the
+    request's session has already been closed.
+    """
+    db = SessionLocal()
+    try:
+        for table in history_tables():
+            result = db.execute(
+                select(*[table.c[column] for column in EXPORT_COLUMNS]).order_by(table.c.id)
+                .execution_options(stream_results=True, yield_per=batch_size)
+            )
+            for batch in result.partitions():
+                yield batch
+    finally:
+        db.close()
+
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_history(export_format: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """
+    Export the whole history as a stream of bytes in constant memory.
+
+    Args:
+        export_format (str): 'csv', 'ndjson' or 'parquet'
+        batch_size (int): Rows fetched from the cursor per round trip
+
+    Returns:
+        Iterator[bytes]: Chunks of the encoded export
+
+    Raises:
+        ValueError: If the format is unknown or unavailable
+    """
+    if export_format == "csv":
+        return _export_csv(batch_size)
+    if export_format == "ndjson":
+        return _export_ndjson(batch_size)
+    if export_format == "parquet":
+        if pyarrow is None:
+            raise ValueError("Parquet export requires pyarrow to be installed")
+        return _export_parquet(batch_size)
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def _export_csv(batch_size: int) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in _iter_history_batches(batch_size):
+        writer.writerows([_serialize(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _export_ndjson(batch_size: int) -> Iterator[bytes]:
+    for batch in _iter_history_batches(batch_size):
+        lines = [
+            json.dumps({column: _serialize(value) for column, value in zip(EXPORT_COLUMNS, row)})
+            for row in batch
+        ]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _export_parquet(batch_size: int) -> Iterator[bytes]:
+    schema = pyarrow.schema([
+        (column.name, pyarrow.timestamp("us") if column.name == "timestamp"
+         else pyarrow.int64() if column.name == "id"
+         else pyarrow.float64() if column.name == "molar_mass"
+         else pyarrow.string())
+        for column in FormulaHistory.__table__.columns if column.name in EXPORT_COLUMNS
+    ])
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    # One row group per cursor batch keeps memory bounded by the batch size
+    for batch in _iter_history_batches(batch_size):
+        columns = list(zip(*batch))
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+#=========================================================================
+#=========================================================================
+
+def _parse_row(raw: Dict, keep_ids: bool) -> Dict:
+    """Turn an exported record into insertable column values."""
+    row = {}
+    for column in IMPORT_COLUMNS:
+        value = raw.get(column)
+        if value == "":
+            value = None
+        row[column] = value
+
+    if not row["formula"]:
+        raise ValueError(f"Missing formula in imported row: {raw}")
+    if not keep_ids or row["id"] is None:
+        row.pop("id")
+    else:
+        row["id"] = int(row["id"])
+
+    if row["molar_mass"] is None:
+        row["molar_mass"] = round(calculate_molar_mass(row["formula"]), 4)
+    else:
+        row["molar_mass"] = float(row["molar_mass"])
+
+    timestamp = row["timestamp"]
+    if timestamp is None:
+        row["timestamp"] = datetime.now()
+    elif isinstance(timestamp, str):
+        row["timestamp"] = datetime.fromisoformat(timestamp)
+    return row
+
+
+def _iter_import_records(file: BinaryIO, import_format: str) -> Iterator[Dict]:
+    if import_format == "csv":
+        yield from csv.DictReader(io.TextIOWrapper(file, encoding="utf-8", newline=""))
+    elif import_format == "ndjson":
+        for line in io.TextIOWrapper(file, encoding="utf-8"):
+            if line.strip():
+                yield json.loads(line)
+    elif import_format == "parquet":
+        if pyarrow is None:
+            raise ValueError("Parquet import requires pyarrow to be installed")
+        for batch in pyarrow.parquet.ParquetFile(file).iter_batches(batch_size=IMPORT_BATCH_SIZE):
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Unsupported import format: {import_format}")
+
+
+def import_history(
+    db: Session,
+    file: BinaryIO,
+    import_format: str,
+    keep_ids: bool = False,
+    batch_size: int = IMPORT_BATCH_SIZE
+) -> int:
+    """
+    Bulk-load history rows from an export file using batched executemany inserts.
+
+    Rows are sent to the database batch by batch, so memory stays bounded for
+    files of any size, but the whole import is one transaction: an invalid row
+    or an ID collision rolls everything back and a retry never duplicates rows.
+
+    Args:
+        db (Session): Database session
+        file (BinaryIO): Export file opened in binary mode
+        import_format (str): 'csv', 'ndjson' or 'parquet'
+        keep_ids (bool): Keep the exported IDs instead of assigning new ones
+        batch_size (int): Rows per INSERT batch
+
+    Returns:
+        int: Number of imported rows
+
+    Raises:
+        ValueError: If the format is unsupported or a row is invalid (with its row number)
+        IntegrityError: If a kept ID already exists
+    """
+    table = FormulaHistory.__table__
+    imported = 0
+    batch = []
+
+    def flush():
+        # executemany needs the same keys in every row: rows keeping their ID go separately
+        for keep_id in (True, False):
+            rows = [row for row in batch if ("id" in row) == keep_id]
+            if rows:
+                db.execute(insert(table), rows)
+        record_calculations(db, [(row["timestamp"], row["formula"], row.get("user_ip")) for row in batch])
+        index_for_search(db, [(row["formula"], row.get("iupac_name")) for row in batch])
+
+    try:
+        for number, raw in enumerate(_iter_import_records(file, import_format), start=1):
+            try:
+                batch.append(_parse_row(raw, keep_ids))
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"Row {number}: {e}") from e
+            if len(batch) >= batch_size:
+                flush()
+                imported += len(batch)
+                batch = []
+        if batch:
+            flush()
+            imported += len(batch)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return imported
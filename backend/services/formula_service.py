@@ -1,9 +1,15 @@
 import re
+from functools import lru_cache
 from typing import List, Tuple
 from core import settings
+from core.logging_config import get_logger
+from core.periodic_table import MASSES, element_id
 from utils import validate_formula
 
 
+logger = get_logger("formula")
+
+
 def parse_formula(formula: str) -> List[Tuple[str, int]]:
     """
     Parse a chemical formula into its constituent elements and counts.
@@ -17,6 +23,12 @@ def parse_formula(formula: str) -> List[Tuple[str, int]]:
     Raises:
         ValueError: If formula format is invalid
     """
+    return list(_parse_formula(formula))
+
+
+@lru_cache(maxsize=settings.FORMULA_CACHE_SIZE)
+def _parse_formula(formula: str) -> Tuple[Tuple[str, int], ...]:
+    """Cached parse; returns a tuple so cached results cannot be modified by callers."""
     try:
         tokens = re.findall(r'[A-Z][a-z]?|\d+|\(|\)', formula)
         if not tokens:
@@ -69,14 +81,38 @@ def parse_formula(formula: str) -> List[Tuple[str, int]]:
         if len(stack) != 1:
             raise ValueError(f"Unbalanced parentheses in formula: {formula}")
             
-        return stack[0]  # Returns a list of (element, count) pairs from the top-level group
+        return tuple(stack[0])  # (element, count) pairs from the top-level group
     except Exception as e:
         # Catch any other unexpected errors and provide a clear message
-        print(f"Error parsing formula '{formula}': {str(e)}")
+        logger.debug("Error parsing formula '%s': %s", formula, e)
         raise ValueError(f"Error parsing formula: {str(e)}")
 
 ## ========================================================================================
 
+def parse_formula_ids(formula: str) -> List[Tuple[int, int]]:
+    """
+    Parse a chemical formula into integer-coded (atomic number, count) pairs.
+    
+    Args:
+        formula (str): Chemical formula to parse
+        
+    Returns:
+        List[Tuple[int, int]]: List of (atomic number, count) tuples
+        
+    Raises:
+        ValueError: If the formula is invalid or contains unknown elements
+    """
+    composition = []
+    for element, count in parse_formula(formula):
+        number = element_id(element)
+        if not number:
+            raise ValueError(f"Unknown element: {element}")
+        composition.append((number, count))
+    return composition
+
+## ========================================================================================
+
+@lru_cache(maxsize=settings.FORMULA_CACHE_SIZE)
 def calculate_molar_mass(formula: str) -> float:
     """
     Calculate the molar mass of a chemical formula.
@@ -93,12 +129,8 @@ def calculate_molar_mass(formula: str) -> float:
     # Validate formula first
     validate_formula(formula)
     
-    parsed = parse_formula(formula)
     total_mass = 0
-    
-    for element, count in parsed:
-        if element not in settings.atomic_masses:
-            raise ValueError(f"Unknown element: {element}")
-        total_mass += settings.atomic_masses[element] * count
+    for number, count in parse_formula_ids(formula):
+        total_mass += MASSES[number] * count
     
     return total_mass
\ No newline at end of file
@@ -1,25 +1,39 @@
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from fastapi import Request
+from sqlalchemy import case, delete, literal, select, update
 from sqlalchemy.orm import Session
 
+from core.logging_config import get_logger
+from data.property_cache import PROPERTY_COLUMNS
 from database import FormulaHistory
 from .formula_service import calculate_molar_mass
-from utils import validate_formula
+from .partition_service import history_tables
+from .search_service import index_for_search
+from .stats_service import record_calculation
+from utils import stage, validate_formula
 
 
+logger = get_logger("history")
+
+
+@stage("save_to_database")
 def save_to_database(
     db: Session, 
     formula: str, 
     molar_mass: float, 
     properties: Dict, 
-    req: Optional[Request] = None
-) -> None:
+    req: Optional[Request] = None,
+    client_ip: Optional[str] = None
+) -> Optional[int]:
     try:
-        client_ip = req.client.host if req else None
+        if req:
+            client_ip = req.client.host
+        timestamp = datetime.now()
         db_formula = FormulaHistory(
             formula=formula,
             molar_mass=round(molar_mass, 4),
+            timestamp=timestamp,
             user_ip=client_ip,
             boiling_point=properties.get("boiling_point"),
             melting_point=properties.get("melting_point"),
@@ -32,25 +46,95 @@ def save_to_database(
             compound_url=properties.get("compound_url")
         )
         db.add(db_formula)
+        # Keep the dashboard rollups in step with the raw history
+        record_calculation(db, timestamp, formula, client_ip)
+        index_for_search(db, [(formula, properties.get("iupac_name"))])
         db.commit()
+        return db_formula.id
     except Exception as db_error:
-        print(f"Database error (non-critical): {str(db_error)}")
+        db.rollback()
+        logger.error("Database error (non-critical): %s", db_error)
+        return None
+
+
+def get_recent_history(db: Session, limit: int) -> List[Dict]:
+    """
+    Most recent history entries, newest first, including archived months.
+
+    Tables are ordered newest first, so archives are only read when the
+    current table has fewer than `limit` entries.
+    """
+    entries = []
+    for table in history_tables(db.get_bind()):
+        query = select(table).order_by(table.c.timestamp.desc()).limit(limit - len(entries))
+        entries.extend(dict(row._mapping) for row in db.execute(query))
+        if len(entries) >= limit:
+            break
+    return entries
+
+
+def update_history_properties(db: Session, formula_id: int, properties: Dict) -> None:
+    """Fill in the properties of a history entry saved with a partial result."""
+    try:
+        db_formula = db.query(FormulaHistory).filter(FormulaHistory.id == formula_id).first()
+        if not db_formula:
+            return
+        for column in PROPERTY_COLUMNS:
+            if properties.get(column) is not None:
+                setattr(db_formula, column, properties[column])
+        index_for_search(db, [(db_formula.formula, db_formula.iupac_name)])
+        db.commit()
+    except Exception as db_error:
+        db.rollback()
+        logger.error("Database error (non-critical): %s", db_error)
+
+
+def _archived_table(db: Session, formula_id: int):
+    """Archive table holding the history entry `formula_id`, or None if there is none."""
+    for table in history_tables(db.get_bind())[1:]:
+        if db.execute(select(table.c.id).where(table.c.id == formula_id)).first():
+            return table
+    return None
+
+
+def _move_to_current(db: Session, table, row_ids: List[int], values: Dict) -> int:
+    """
+    Move archived history entries back into `formulas`, applying `values`.
+
+    Entries that get a fresh timestamp belong to the current month; left in a
+    past-month archive they would be dropped with that month by retention.
+    """
+    history = FormulaHistory.__table__
+    columns = [column.name for column in history.columns]
+    source = [
+        literal(values[column.name], column.type).label(column.name) if column.name in values else table.c[column.name]
+        for column in history.columns
+    ]
+    db.execute(history.insert().from_select(columns, select(*source).where(table.c.id.in_(row_ids))))
+    return db.execute(delete(table).where(table.c.id.in_(row_ids))).rowcount
 
 
 def update_formula_in_history(db: Session, formula_id: int, new_formula: str) -> FormulaHistory:
-    # Find the formula by ID
+    # Find the formula by ID, also in the per-month archives
     db_formula = db.query(FormulaHistory).filter(FormulaHistory.id == formula_id).first()
-    if not db_formula:
-        raise Exception(f"Formula with ID {formula_id} not found")
+    archive = _archived_table(db, formula_id) if not db_formula else None
+    if not db_formula and archive is None:
+        raise LookupError(f"Formula with ID {formula_id} not found")
     
     # Validate and calculate new molar mass
     validate_formula(new_formula)
     molar_mass = calculate_molar_mass(new_formula)
     
+    if archive is not None:
+        # The entry gets a current timestamp, so it moves back to the current month
+        _move_to_current(db, archive, [formula_id], {})
+        db_formula = db.query(FormulaHistory).filter(FormulaHistory.id == formula_id).one()
+    
     # Update the formula
     db_formula.formula = new_formula
     db_formula.molar_mass = round(molar_mass, 4)
     db_formula.timestamp = datetime.now()  # Update timestamp to current time
+    index_for_search(db, [(new_formula, db_formula.iupac_name)])
     
     db.commit()
     db.refresh(db_formula)
@@ -61,11 +145,182 @@ def update_formula_in_history(db: Session, formula_id: int, new_formula: str) ->
 def delete_formula_from_history(db: Session, formula_id: int) -> Dict[str, str]:
     # Find the formula by ID
     db_formula = db.query(FormulaHistory).filter(FormulaHistory.id == formula_id).first()
-    if not db_formula:
-        raise Exception(f"Formula with ID {formula_id} not found")
-    
-    # Delete the formula
-    db.delete(db_formula)
+    if db_formula:
+        db.delete(db_formula)
+    else:
+        archive = _archived_table(db, formula_id)
+        if archive is None:
+            raise LookupError(f"Formula with ID {formula_id} not found")
+        db.execute(delete(archive).where(archive.c.id == formula_id))
     db.commit()
     
-    return {"message": f"Formula with ID {formula_id} deleted successfully"}
\ No newline at end of file
+    return {"message": f"Formula with ID {formula_id} deleted successfully"}
+
+
+BULK_BATCH_SIZE = 1000
+
+
+def _bulk_conditions(
+    table,
+    ids: Optional[List[int]],
+    formula: Optional[str],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    user_ip: Optional[str]
+) -> List:
+    """WHERE conditions selecting history rows; all given criteria must match."""
+    conditions = []
+    if ids is not None:
+        conditions.append(table.c.id.in_(ids))
+    if formula is not None:
+        conditions.append(table.c.formula == formula)
+    if start is not None:
+        conditions.append(table.c.timestamp >= start)
+    if end is not None:
+        conditions.append(table.c.timestamp < end)
+    if user_ip is not None:
+        conditions.append(table.c.user_ip == user_ip)
+    if not conditions:
+        raise ValueError("At least one of ids, formula, start, end or user_ip is required")
+    return conditions
+
+
+def _matching_batches(db: Session, table, conditions: List, columns: List, batch_size: int):
+    """
+    Yield rows matching `conditions` in ID order, one batch at a time.
+
+    Uses keyset pagination on the primary key, so every batch is one indexed
+    range query no matter how many rows were already processed or deleted.
+    """
+    last_id = None
+    while True:
+        query = select(table.c.id, *columns).where(*conditions)
+        if last_id is not None:
+            query = query.where(table.c.id > last_id)
+        rows = db.execute(query.order_by(table.c.id).limit(batch_size)).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def bulk_delete_history(
+    db: Session,
+    ids: Optional[List[int]] = None,
+    formula: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_ip: Optional[str] = None,
+    batch_size: int = BULK_BATCH_SIZE
+) -> Dict[str, int]:
+    """
+    Delete every history entry matching the given criteria with batched DELETE statements.
+
+    Each batch is committed on its own so locks and transactions stay short.
+
+    Args:
+        db (Session): Database session
+        ids (List[int]): Only entries with these IDs
+        formula (str): Only entries with exactly this formula
+        start (datetime): Only entries at or after this time
+        end (datetime): Only entries before this time
+        user_ip (str): Only entries from this client IP
+        batch_size (int): Rows per DELETE statement
+
+    Returns:
+        Dict[str, int]: Number of deleted entries
+
+    Raises:
+        ValueError: If no criterion is given
+    """
+    affected = 0
+    try:
+        for table in history_tables(db.get_bind()):
+            conditions = _bulk_conditions(table, ids, formula, start, end, user_ip)
+            for rows in _matching_batches(db, table, conditions, [], batch_size):
+                result = db.execute(delete(table).where(table.c.id.in_([row[0] for row in rows])))
+                db.commit()
+                affected += result.rowcount
+    except Exception:
+        db.rollback()
+        raise
+    return {"affected": affected, "skipped": 0}
+
+
+def bulk_update_history(
+    db: Session,
+    new_formula: Optional[str] = None,
+    ids: Optional[List[int]] = None,
+    formula: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    user_ip: Optional[str] = None,
+    batch_size: int = BULK_BATCH_SIZE
+) -> Dict[str, int]:
+    """
+    Update every history entry matching the given criteria with batched UPDATE statements.
+
+    With `new_formula`, matching entries get that formula, its molar mass and
+    a fresh timestamp (like update_formula_in_history); archived entries move
+    back into `formulas`. Without it, their
+    molar masses are recomputed from their own formulas. Either way each
+    distinct formula is calculated once, and each batch is written with a
+    single UPDATE.
+
+    Args:
+        db (Session): Database session
+        new_formula (str): Formula to set, or None to only recompute molar masses
+        ids, formula, start, end, user_ip: Selection criteria, see bulk_delete_history
+        batch_size (int): Rows per UPDATE statement
+
+    Returns:
+        Dict[str, int]: Number of updated entries, and of entries skipped
+        because their stored formula is invalid
+
+    Raises:
+        ValueError: If no criterion is given or the new formula is invalid
+    """
+    masses = {}
+    if new_formula is not None:
+        validate_formula(new_formula)
+        masses[new_formula] = round(calculate_molar_mass(new_formula), 4)
+
+    affected = 0
+    skipped = 0
+    try:
+        for table in history_tables(db.get_bind()):
+            conditions = _bulk_conditions(table, ids, formula, start, end, user_ip)
+            for rows in _matching_batches(db, table, conditions, [table.c.formula], batch_size):
+                if new_formula is not None:
+                    row_ids = [row[0] for row in rows]
+                    values = {"formula": new_formula, "molar_mass": masses[new_formula], "timestamp": datetime.now()}
+                    if table is not FormulaHistory.__table__:
+                        # Freshly timestamped entries leave their past-month archive
+                        affected += _move_to_current(db, table, row_ids, values)
+                        db.commit()
+                        continue
+                    stmt = update(table).values(**values)
+                else:
+                    for _, row_formula in rows:
+                        if row_formula not in masses:
+                            try:
+                                masses[row_formula] = round(calculate_molar_mass(row_formula), 4)
+                            except ValueError:
+                                masses[row_formula] = None
+                    row_ids = [row_id for row_id, row_formula in rows if masses[row_formula] is not None]
+                    skipped += len(rows) - len(row_ids)
+                    if not row_ids:
+                        continue
+                    batch_masses = {row_formula: masses[row_formula] for _, row_formula in rows if masses[row_formula] is not None}
+                    stmt = update(table).values(molar_mass=case(batch_masses, value=table.c.formula))
+                result = db.execute(stmt.where(table.c.id.in_(row_ids)))
+                db.commit()
+                affected += result.rowcount
+
+        if new_formula is not None and affected:
+            index_for_search(db, [(new_formula, None)])
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"affected": affected, "skipped": skipped}
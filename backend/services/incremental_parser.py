@@ -0,0 +1,112 @@
+import os
+import string
+from typing import Dict, Optional, Tuple
+
+from core.periodic_table import MASSES, element_id
+
+
+# Parser state after each character. A frame is one parenthesis level:
+#   (committed mass, pending symbol, pending group mass, pending digits)
+# The pending unit (an element or a closed group) stays open until the next
+# token, because following digits or a lowercase letter can still change it.
+Frame = Tuple[float, Optional[str], Optional[float], str]
+State = Tuple[Tuple[Frame, ...], Optional[str]]
+
+_EMPTY_FRAME: Frame = (0.0, None, None, "")
+_INITIAL_STATE: State = ((_EMPTY_FRAME,), None)
+
+
+def _commit(frame: Frame) -> Tuple[Optional[Frame], Optional[str]]:
+    """Add the pending unit of a frame to its committed mass."""
+    total, symbol, group_mass, digits = frame
+    if symbol is None and group_mass is None:
+        return frame, None
+    if symbol is not None:
+        number = element_id(symbol)
+        if not number:
+            return None, f"Unknown element: {symbol}"
+        unit = MASSES[number]
+    else:
+        unit = group_mass
+    return (total + unit * (int(digits) if digits else 1), None, None, ""), None
+
+
+def _step(state: State, char: str) -> State:
+    """Advance the parser by one character."""
+    stack, error = state
+    if error:
+        return state
+    total, symbol, group_mass, digits = stack[-1]
+
+    if char in string.ascii_uppercase:
+        frame, error = _commit(stack[-1])
+        if error:
+            return stack, error
+        return stack[:-1] + ((frame[0], char, None, ""),), None
+    if char in string.ascii_lowercase:
+        if symbol is None or len(symbol) != 1 or digits:
+            return stack, f"Invalid formula format at '{char}'"
+        return stack[:-1] + ((total, symbol + char, None, ""),), None
+    if char in string.digits:
+        if symbol is None and group_mass is None:
+            return stack, f"Unexpected number at '{char}'"
+        return stack[:-1] + ((total, symbol, group_mass, digits + char),), None
+    if char == "(":
+        frame, error = _commit(stack[-1])
+        if error:
+            return stack, error
+        return stack[:-1] + (frame, _EMPTY_FRAME), None
+    if char == ")":
+        if len(stack) <= 1:
+            return stack, "Unbalanced parentheses"
+        group, error = _commit(stack[-1])
+        if error:
+            return stack, error
+        parent, error = _commit(stack[-2])
+        if error:
+            return stack, error
+        return stack[:-2] + ((parent[0], None, group[0], ""),), None
+    return stack, f"Invalid character '{char}'"
+
+
+class IncrementalFormulaParser:
+    """
+    Molar mass calculator for a formula that is edited a few characters at a time.
+
+    The parser state after every character is kept as an immutable snapshot,
+    so an edit only reparses the characters after the common prefix of the old
+    and new input. Results match calculate_molar_mass for complete formulas.
+    """
+
+    def __init__(self):
+        self.formula = ""
+        self._states = [_INITIAL_STATE]
+
+    def update(self, formula: str) -> Dict:
+        """
+        Replace the current input and return the updated calculation.
+
+        Returns:
+            Dict: formula, molar_mass (None unless valid), valid, and error
+            (None, or why the formula is invalid or incomplete)
+        """
+        prefix = len(os.path.commonprefix([self.formula, formula]))
+        del self._states[prefix + 1:]
+        for char in formula[prefix:]:
+            self._states.append(_step(self._states[-1], char))
+        self.formula = formula
+        return self._result()
+
+    def _result(self) -> Dict:
+        stack, error = self._states[-1]
+        mass = None
+        if not error:
+            if not self.formula:
+                error = "Empty formula"
+            elif len(stack) > 1:
+                error = "Unbalanced parentheses"
+            else:
+                frame, error = _commit(stack[0])
+                if not error:
+                    mass = round(frame[0], 4)
+        return {"formula": self.formula, "molar_mass": mass, "valid": mass is not None, "error": error}
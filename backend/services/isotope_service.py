@@ -0,0 +1,139 @@
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from core.isotopes import ISOTOPES, most_abundant_isotope_mass
+from .formula_service import calculate_molar_mass, parse_formula
+
+
+# Distributions are kept at unit (nominal mass) resolution. For every nominal
+# mass we track the total probability and the probability-weighted exact mass,
+# which gives exact peak centroids without enumerating isotopologues.
+# A distribution is (offset, probabilities, weighted masses) where index k
+# corresponds to nominal mass offset + k.
+Distribution = Tuple[int, np.ndarray, np.ndarray]
+
+PRUNE_THRESHOLD = 1e-12  # relative to the tallest peak
+MIN_REPORTED_INTENSITY = 1e-7  # % of the base peak; below this centroids are dominated by round-off
+FFT_MIN_SIZE = 64  # below this, direct convolution is faster than FFT
+
+
+def _convolve(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if min(len(a), len(b)) < FFT_MIN_SIZE:
+        return np.convolve(a, b)
+    size = len(a) + len(b) - 1
+    n = 1 << (size - 1).bit_length()
+    return np.fft.irfft(np.fft.rfft(a, n) * np.fft.rfft(b, n), n)[:size]
+
+
+def _prune(offset: int, probs: np.ndarray, masses: np.ndarray) -> Distribution:
+    """Drop negligible tails (including FFT round-off noise) from both ends."""
+    keep = np.nonzero(probs > probs.max() * PRUNE_THRESHOLD)[0]
+    first, last = keep[0], keep[-1] + 1
+    return offset + int(first), probs[first:last], masses[first:last]
+
+
+def _combine(a: Distribution, b: Distribution) -> Distribution:
+    offset_a, probs_a, masses_a = a
+    offset_b, probs_b, masses_b = b
+    probs = np.clip(_convolve(probs_a, probs_b), 0, None)
+    masses = np.clip(_convolve(masses_a, probs_b) + _convolve(probs_a, masses_b), 0, None)
+    return _prune(offset_a + offset_b, probs, masses)
+
+
+@lru_cache(maxsize=128)
+def _atom_distribution(symbol: str) -> Distribution:
+    if symbol not in ISOTOPES:
+        raise ValueError(f"No natural isotopic composition for element: {symbol}")
+    isotopes = ISOTOPES[symbol]
+    nominal = [round(mass) for mass, _ in isotopes]
+    offset = min(nominal)
+    probs = np.zeros(max(nominal) - offset + 1)
+    masses = np.zeros_like(probs)
+    for (mass, abundance), number in zip(isotopes, nominal):
+        probs[number - offset] += abundance
+        masses[number - offset] += abundance * mass
+    return offset, probs, masses
+
+
+@lru_cache(maxsize=1024)
+def _element_distribution(symbol: str, count: int) -> Distribution:
+    """Distribution of `count` atoms of one element by repeated squaring."""
+    result = None
+    power = _atom_distribution(symbol)
+    while count:
+        if count & 1:
+            result = power if result is None else _combine(result, power)
+        count >>= 1
+        if count:
+            power = _combine(power, power)
+    return result
+
+
+def _composition(formula: str) -> Dict[str, int]:
+    counts = Counter()
+    for element, count in parse_formula(formula):
+        counts[element] += count
+    return dict(counts)
+
+
+def calculate_monoisotopic_mass(formula: str) -> float:
+    """
+    Calculate the monoisotopic mass of a formula from the most abundant isotope of each element.
+
+    Args:
+        formula (str): Chemical formula
+
+    Returns:
+        float: Monoisotopic mass in u
+
+    Raises:
+        ValueError: If the formula is invalid or an element has no natural isotopes
+    """
+    return sum(most_abundant_isotope_mass(element) * count for element, count in _composition(formula).items())
+
+
+def calculate_isotope_pattern(formula: str, min_intensity: float = 0.01) -> List[Dict[str, float]]:
+    """
+    Calculate the isotopic distribution of a formula.
+
+    Element distributions are built by repeated squaring with (FFT) convolution
+    and pruned after every step, so the cost grows with log(atom count) and
+    the width of the pattern rather than with the number of isotopologues.
+
+    Args:
+        formula (str): Chemical formula
+        min_intensity (float): Smallest relative intensity (% of the base peak) to report
+
+    Returns:
+        List[Dict[str, float]]: Peaks ordered by mass with their centroid mass,
+        relative intensity (%) and absolute abundance (fraction)
+
+    Raises:
+        ValueError: If the formula is invalid or an element has no natural isotopes
+    """
+    calculate_molar_mass(formula)  # validates the formula and its elements
+
+    distribution = None
+    for element, count in sorted(_composition(formula).items()):
+        if not count:
+            continue
+        part = _element_distribution(element, count)
+        distribution = part if distribution is None else _combine(distribution, part)
+
+    if distribution is None:
+        raise ValueError(f"Formula contains no atoms: {formula}")
+    _, probs, masses = distribution
+    base = probs.max()
+    peaks = []
+    for prob, weighted_mass in zip(probs, masses):
+        intensity = prob / base * 100
+        if intensity >= max(min_intensity, MIN_REPORTED_INTENSITY):
+            peaks.append({
+                "mass": round(float(weighted_mass / prob), 6),
+                "intensity": round(float(intensity), 4),
+                "abundance": float(prob)
+            })
+    return peaks
@@ -0,0 +1,323 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, Index, MetaData, Table, delete, func, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+from core import settings
+from core.logging_config import get_logger
+from database import FormulaHistory, engine
+
+
+logger = get_logger("partitions")
+
+
+# History is split into calendar-month partitions:
+# - MySQL/MariaDB: native RANGE COLUMNS partitions `pYYYYMM` on `formulas`,
+#   plus a catch-all `pfuture` partition that new months are split from.
+# - SQLite: `formulas` keeps the current and previous month, older months are
+#   moved into per-month tables `formulas_pYYYYMM`.
+# Retention always drops whole partitions/tables instead of deleting rows.
+HISTORY_TABLE = FormulaHistory.__table__
+ARCHIVE_PREFIX = f"{HISTORY_TABLE.name}_p"
+FUTURE_PARTITION = "pfuture"
+
+_archive_metadata = MetaData()
+_archive_tables: Dict[str, Table] = {}
+
+# history_tables() is on every search/export/stats path, so the table list is
+# cached; maintenance invalidates it, and the expiry picks up archives that
+# another worker process created.
+HISTORY_TABLES_CACHE_SECONDS = 60
+_history_tables_cache: Dict[Engine, Tuple[float, List[Table]]] = {}
+
+
+def month_start(value: datetime) -> datetime:
+    """Return midnight on the first day of the month containing `value`."""
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Shift a month start by a (possibly negative) number of months."""
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_suffix(start: datetime) -> str:
+    return start.strftime("%Y%m")
+
+
+def _suffix_start(suffix: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(suffix, "%Y%m")
+    except ValueError:
+        return None
+
+
+def _retention_cutoff(now: datetime) -> Optional[datetime]:
+    """Oldest month start that must be kept, or None if history is kept forever."""
+    if settings.HISTORY_RETENTION_MONTHS <= 0:
+        return None
+    return add_months(month_start(now), -(settings.HISTORY_RETENTION_MONTHS - 1))
+
+
+#=========================================================================
+# SQLite: per-month archive tables
+#=========================================================================
+
+def _archive_table(name: str) -> Table:
+    """Table object for a per-month archive with the same columns and indexes as `formulas`."""
+    if name not in _archive_tables:
+        columns = [
+            Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+            for column in HISTORY_TABLE.columns
+        ]
+        # Searches, exports and bulk operations filter the archives like `formulas`
+        indexes = [
+            Index(f"ix_{name}_{column.name}", column.name)
+            for column in HISTORY_TABLE.columns
+            if column.index and not column.primary_key
+        ]
+        _archive_tables[name] = Table(name, _archive_metadata, *columns, *indexes)
+    return _archive_tables[name]
+
+
+def _archive_names(conn: Connection) -> List[str]:
+    names = [
+        name for name in inspect(conn).get_table_names()
+        if name.startswith(ARCHIVE_PREFIX) and _suffix_start(name[len(ARCHIVE_PREFIX):])
+    ]
+    return sorted(names, reverse=True)
+
+
+def history_tables(bind: Optional[Engine] = None) -> List[Table]:
+    """
+    All tables holding history rows, newest first.
+
+    On MySQL this is just `formulas` (partitioning is transparent); on SQLite
+    it also includes the per-month archive tables.
+    """
+    bind = bind or engine
+    if bind.dialect.name != "sqlite":
+        return [HISTORY_TABLE]
+    cached = _history_tables_cache.get(bind)
+    if cached and time.monotonic() - cached[0] < HISTORY_TABLES_CACHE_SECONDS:
+        return list(cached[1])
+    with bind.connect() as conn:
+        tables = [HISTORY_TABLE] + [_archive_table(name) for name in _archive_names(conn)]
+    _history_tables_cache[bind] = (time.monotonic(), tables)
+    return list(tables)
+
+
+def _ensure_sqlite_autoincrement(conn: Connection) -> None:
+    """
+    Make sure `formulas` never hands out an ID that is already used in an archive.
+
+    `sqlite_autoincrement` only applies to newly created tables, so an older
+    `formulas` table is rebuilt with AUTOINCREMENT first. The sequence is then
+    kept at or above the highest ID in any archive, since rotation can empty
+    `formulas` and SQLite would otherwise start again from its own max(id).
+    """
+    name = HISTORY_TABLE.name
+    sql = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": name}
+    ).scalar()
+    if sql and "AUTOINCREMENT" not in sql.upper():
+        logger.info("Rebuilding %s with AUTOINCREMENT", name)
+        for index in [index["name"] for index in inspect(conn).get_indexes(name)]:
+            conn.execute(text(f'DROP INDEX "{index}"'))
+        conn.execute(text(f'ALTER TABLE "{name}" RENAME TO "{name}_rebuild"'))
+        HISTORY_TABLE.create(conn)
+        columns = ", ".join(f'"{column.name}"' for column in HISTORY_TABLE.columns)
+        conn.execute(text(f'INSERT INTO "{name}" ({columns}) SELECT {columns} FROM "{name}_rebuild"'))
+        conn.execute(text(f'DROP TABLE "{name}_rebuild"'))
+
+    highest = max(
+        conn.execute(select(func.max(table.c.id))).scalar() or 0
+        for table in [HISTORY_TABLE] + [_archive_table(archive) for archive in _archive_names(conn)]
+    )
+    sequence = conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": name}).scalar()
+    if sequence is None:
+        conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"), {"name": name, "seq": highest})
+    elif sequence < highest:
+        conn.execute(text("UPDATE sqlite_sequence SET seq = :seq WHERE name = :name"), {"name": name, "seq": highest})
+
+
+def _rotate_sqlite(conn: Connection, now: datetime) -> List[str]:
+    """Move months older than the previous month out of `formulas` into archive tables."""
+    boundary = add_months(month_start(now), -1)
+    moved = []
+
+    oldest = conn.execute(
+        select(func.min(HISTORY_TABLE.c.timestamp)).where(HISTORY_TABLE.c.timestamp < boundary)
+    ).scalar()
+    if oldest is None:
+        return moved
+    if isinstance(oldest, str):
+        oldest = datetime.fromisoformat(oldest)
+
+    start = month_start(oldest)
+    while start < boundary:
+        end = add_months(start, 1)
+        in_month = (HISTORY_TABLE.c.timestamp >= start) & (HISTORY_TABLE.c.timestamp < end)
+        if conn.execute(select(HISTORY_TABLE.c.id).where(in_month).limit(1)).first() is None:
+            start = end  # No archive tables for months without history
+            continue
+        archive = _archive_table(ARCHIVE_PREFIX + partition_suffix(start))
+        archive.create(conn, checkfirst=True)
+        columns = [column.name for column in HISTORY_TABLE.columns]
+        conn.execute(archive.insert().from_select(columns, select(HISTORY_TABLE).where(in_month)))
+        conn.execute(delete(HISTORY_TABLE).where(in_month))
+        moved.append(archive.name)
+        start = end
+    return moved
+
+
+def _prune_sqlite(conn: Connection, cutoff: datetime) -> List[str]:
+    dropped = []
+    for name in _archive_names(conn):
+        if add_months(_suffix_start(name[len(ARCHIVE_PREFIX):]), 1) <= cutoff:
+            conn.execute(text(f'DROP TABLE "{name}"'))
+            _archive_tables.pop(name, None)
+            dropped.append(name)
+
+    # With a retention shorter than the hot window, trim the remainder of `formulas`
+    conn.execute(delete(HISTORY_TABLE).where(HISTORY_TABLE.c.timestamp < cutoff))
+    return dropped
+
+
+#=========================================================================
+# MySQL/MariaDB: native RANGE COLUMNS partitions
+#=========================================================================
+
+def _mysql_partitions(conn: Connection) -> List[str]:
+    rows = conn.execute(text(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION"
+    ), {"table": HISTORY_TABLE.name}).all()
+    return [row[0] for row in rows]
+
+
+def _mysql_partition_clause(starts: List[datetime]) -> str:
+    parts = [
+        f"PARTITION p{partition_suffix(start)} VALUES LESS THAN ('{add_months(start, 1):%Y-%m-%d}')"
+        for start in starts
+    ]
+    parts.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return ", ".join(parts)
+
+
+def _months(first: datetime, last: datetime) -> List[datetime]:
+    months = []
+    while first <= last:
+        months.append(first)
+        first = add_months(first, 1)
+    return months
+
+
+def _ensure_mysql(conn: Connection, now: datetime) -> List[str]:
+    """Partition `formulas` on first run, then keep HISTORY_PARTITIONS_AHEAD months pre-created."""
+    last = add_months(month_start(now), settings.HISTORY_PARTITIONS_AHEAD)
+    partitions = _mysql_partitions(conn)
+
+    if not partitions:
+        # The partitioning column must be part of every unique key, including the primary key
+        conn.execute(text(f"UPDATE {HISTORY_TABLE.name} SET timestamp = NOW() WHERE timestamp IS NULL"))
+        conn.execute(text(
+            f"ALTER TABLE {HISTORY_TABLE.name} "
+            "MODIFY timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+            "DROP PRIMARY KEY, ADD PRIMARY KEY (id, timestamp)"
+        ))
+        oldest = conn.execute(select(func.min(HISTORY_TABLE.c.timestamp))).scalar() or now
+        months = _months(month_start(oldest), last)
+        conn.execute(text(
+            f"ALTER TABLE {HISTORY_TABLE.name} PARTITION BY RANGE COLUMNS(timestamp) "
+            f"({_mysql_partition_clause(months)})"
+        ))
+        return [f"p{partition_suffix(start)}" for start in months]
+
+    existing = {name for name in partitions if name != FUTURE_PARTITION}
+    newest = max((_suffix_start(name[1:]) for name in existing if _suffix_start(name[1:])), default=None)
+    first = add_months(newest, 1) if newest else month_start(now)
+    months = _months(first, last)
+    if months:
+        # Splitting the (normally empty) catch-all partition is a metadata-only operation
+        conn.execute(text(
+            f"ALTER TABLE {HISTORY_TABLE.name} REORGANIZE PARTITION {FUTURE_PARTITION} "
+            f"INTO ({_mysql_partition_clause(months)})"
+        ))
+    return [f"p{partition_suffix(start)}" for start in months]
+
+
+def _prune_mysql(conn: Connection, cutoff: datetime) -> List[str]:
+    expired = []
+    for name in _mysql_partitions(conn):
+        start = _suffix_start(name[1:]) if name != FUTURE_PARTITION else None
+        if start and add_months(start, 1) <= cutoff:
+            expired.append(name)
+
+    # MySQL refuses to drop every partition, and only `pfuture` is never expired
+    if expired:
+        conn.execute(text(f"ALTER TABLE {HISTORY_TABLE.name} DROP PARTITION {', '.join(expired)}"))
+    return expired
+
+
+#=========================================================================
+#=========================================================================
+
+def maintain_history_partitions(bind: Optional[Engine] = None, now: Optional[datetime] = None) -> Dict[str, List[str]]:
+    """
+    Create upcoming partitions and drop the ones past the retention period.
+
+    Args:
+        bind (Engine): Engine to run against (defaults to the app engine)
+        now (datetime): Reference time (defaults to the current time)
+
+    Returns:
+        Dict[str, List[str]]: Names of created/archived and dropped partitions
+    """
+    bind = bind or engine
+    now = now or datetime.now()
+    cutoff = _retention_cutoff(now)
+    result = {"created": [], "dropped": []}
+
+    with bind.begin() as conn:
+        for index in HISTORY_TABLE.indexes:
+            index.create(conn, checkfirst=True)
+
+        if bind.dialect.name == "mysql":
+            result["created"] = _ensure_mysql(conn, now)
+            if cutoff:
+                result["dropped"] = _prune_mysql(conn, cutoff)
+        elif bind.dialect.name == "sqlite":
+            _ensure_sqlite_autoincrement(conn)
+            result["created"] = _rotate_sqlite(conn, now)
+            # Archives created before they carried indexes get them on the next run
+            for name in _archive_names(conn):
+                for index in _archive_table(name).indexes:
+                    index.create(conn, checkfirst=True)
+            if cutoff:
+                result["dropped"] = _prune_sqlite(conn, cutoff)
+
+    _history_tables_cache.pop(bind, None)
+    return result
+
+
+def start_partition_maintenance() -> threading.Thread:
+    """Run partition maintenance now and then every HISTORY_PARTITION_MAINTENANCE_INTERVAL seconds."""
+    def run():
+        while True:
+            try:
+                result = maintain_history_partitions()
+                if result["created"] or result["dropped"]:
+                    logger.info("History partitions created: %s, dropped: %s", result["created"], result["dropped"])
+            except Exception as e:
+                logger.warning("History partition maintenance failed (non-critical): %s", e)
+            time.sleep(settings.HISTORY_PARTITION_MAINTENANCE_INTERVAL)
+
+    thread = threading.Thread(target=run, name="history-partitions", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,219 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, and_, column, insert, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, aliased
+
+from core import settings
+from core.logging_config import get_logger
+from database import FormulaHistory, FormulaElement, CompoundName
+from .formula_service import parse_formula
+from .partition_service import history_tables
+
+
+logger = get_logger("search")
+
+
+FTS_TABLE = "compound_names_fts"
+MYSQL_FULLTEXT_INDEX = "ft_compound_names_name"
+MIN_FULLTEXT_QUERY = 3  # trigram/ngram indexes cannot answer shorter substrings
+
+# How IUPAC name substrings are matched: 'fts5', 'fulltext' or 'like'
+_name_search_mode: Optional[str] = None
+
+
+def ensure_search_indexes(bind: Engine) -> str:
+    """
+    Create the full-text index over compound names if the database supports it.
+
+    Uses an FTS5 trigram table on SQLite and an ngram FULLTEXT index on MySQL.
+    Anything else falls back to LIKE over the (small) distinct-name table.
+
+    Returns:
+        str: The name search mode in use
+    """
+    global _name_search_mode
+    mode = "like"
+    with bind.begin() as conn:
+        for index in FormulaHistory.__table__.indexes:
+            if "iupac_name" in index.columns:
+                index.create(conn, checkfirst=True)
+
+        try:
+            if bind.dialect.name == "sqlite":
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {"name": FTS_TABLE}
+                ).first()
+                if not exists:
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                        "name, content='compound_names', content_rowid='id', tokenize='trigram')"
+                    ))
+                    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+                conn.execute(text(
+                    "CREATE TRIGGER IF NOT EXISTS compound_names_fts_insert AFTER INSERT ON compound_names "
+                    f"BEGIN INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END"
+                ))
+                mode = "fts5"
+            elif bind.dialect.name == "mysql":
+                exists = conn.execute(text(
+                    "SELECT 1 FROM information_schema.STATISTICS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'compound_names' AND INDEX_NAME = :name"
+                ), {"name": MYSQL_FULLTEXT_INDEX}).first()
+                if not exists:
+                    conn.execute(text(
+                        f"ALTER TABLE compound_names ADD FULLTEXT INDEX {MYSQL_FULLTEXT_INDEX} (name) WITH PARSER ngram"
+                    ))
+                mode = "fulltext"
+        except Exception as e:
+            logger.warning("Full-text name index unavailable, falling back to LIKE: %s", e)
+
+    _name_search_mode = mode
+    return mode
+
+
+def _insert_ignore(db: Session, model, rows: List[Dict]) -> None:
+    """Insert rows, silently skipping ones whose primary/unique key already exists."""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    stmt = insert(model.__table__)
+    if dialect == "mysql":
+        stmt = stmt.prefix_with("IGNORE")
+    elif dialect == "sqlite":
+        stmt = stmt.prefix_with("OR IGNORE")
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        stmt = pg_insert(model.__table__).on_conflict_do_nothing()
+    db.execute(stmt, rows)
+
+
+def index_for_search(db: Session, entries: Iterable[Tuple[str, Optional[str]]]) -> None:
+    """
+    Add formulas and IUPAC names to the search indexes without committing.
+
+    Args:
+        db (Session): Database session the history rows are written with
+        entries: Iterable of (formula, iupac_name) pairs
+    """
+    element_rows = set()
+    names = set()
+    for formula, iupac_name in entries:
+        try:
+            for element, _ in parse_formula(formula):
+                element_rows.add((element, formula))
+        except ValueError:
+            pass  # Unparseable formulas are simply not element-searchable
+        if iupac_name:
+            names.add(iupac_name)
+
+    _insert_ignore(db, FormulaElement, [{"element": e, "formula": f} for e, f in sorted(element_rows)])
+    _insert_ignore(db, CompoundName, [{"name": name} for name in sorted(names)])
+
+
+def rebuild_search_index(db: Session, batch_size: int = 5000) -> int:
+    """
+    Index every distinct formula and IUPAC name already in the history.
+
+    Only needed once for history written before the search indexes existed.
+
+    Returns:
+        int: Number of distinct formulas indexed
+    """
+    entries = set()
+    for table in history_tables(db.get_bind()):
+        entries.update(db.execute(select(table.c.formula, table.c.iupac_name).distinct()).all())
+
+    ordered = sorted(entries, key=lambda entry: (entry[0] or "", entry[1] or ""))
+    for start in range(0, len(ordered), batch_size):
+        index_for_search(db, [entry for entry in ordered[start:start + batch_size] if entry[0]])
+        db.commit()
+    return len({formula for formula, _ in entries})
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _formulas_containing(elements: List[str]):
+    """Subquery of formulas containing all elements, intersecting posting lists via self-joins."""
+    aliases = [aliased(FormulaElement) for _ in elements]
+    query = select(aliases[0].formula).where(aliases[0].element == elements[0])
+    for alias, element in zip(aliases[1:], elements[1:]):
+        query = query.join(alias, and_(alias.formula == aliases[0].formula, alias.element == element))
+    return query
+
+
+def _names_matching(db: Session, substring: str):
+    """Subquery of distinct IUPAC names containing `substring` (case-insensitive)."""
+    mode = _name_search_mode or ensure_search_indexes(db.get_bind())
+    like = CompoundName.name.ilike(f"%{substring}%")
+
+    if mode == "fts5" and len(substring) >= MIN_FULLTEXT_QUERY:
+        phrase = '"' + substring.replace('"', '""') + '"'
+        rowids = text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :phrase").bindparams(phrase=phrase)
+        return select(CompoundName.name).where(CompoundName.id.in_(rowids.columns(column("rowid", Integer))))
+    if mode == "fulltext" and len(substring) >= MIN_FULLTEXT_QUERY:
+        phrase = '"' + substring.replace('"', '') + '"'
+        match = text("MATCH (compound_names.name) AGAINST (:phrase IN BOOLEAN MODE)").bindparams(phrase=phrase)
+        return select(CompoundName.name).where(match).where(like)
+    return select(CompoundName.name).where(like)
+
+
+def search_history(
+    db: Session,
+    formula_prefix: Optional[str] = None,
+    elements: Optional[List[str]] = None,
+    name: Optional[str] = None,
+    limit: int = settings.HISTORY_LIMIT_DEFAULT
+) -> List[Dict]:
+    """
+    Search the history by formula prefix, contained elements and IUPAC name substring.
+
+    All given criteria must match. Every criterion is answered from an index:
+    the B-tree on `formula` for prefixes, `formula_elements` for element
+    containment and the full-text index on `compound_names` for names.
+
+    Args:
+        db (Session): Database session
+        formula_prefix (str): Formulas starting with this string
+        elements (List[str]): Element symbols that must all be present
+        name (str): Substring of the IUPAC name
+        limit (int): Maximum number of entries to return
+
+    Returns:
+        List[Dict]: Matching history entries, newest first
+
+    Raises:
+        ValueError: If no criterion is given or an element is unknown
+    """
+    elements = sorted(set(elements or []))
+    if not (formula_prefix or elements or name):
+        raise ValueError("At least one of formula prefix, elements or name is required")
+    for element in elements:
+        if element not in settings.atomic_masses:
+            raise ValueError(f"Unknown element: {element}")
+
+    results = []
+    names = _names_matching(db, name) if name else None
+    formulas = _formulas_containing(elements) if elements else None
+
+    # Tables are ordered newest first, so older partitions are only read if needed
+    for table in history_tables(db.get_bind()):
+        query = select(table)
+        if formula_prefix:
+            query = query.where(table.c.formula >= formula_prefix)
+            query = query.where(table.c.formula < _prefix_upper_bound(formula_prefix))
+        if formulas is not None:
+            query = query.where(table.c.formula.in_(formulas))
+        if names is not None:
+            query = query.where(table.c.iupac_name.in_(names))
+        query = query.order_by(table.c.timestamp.desc()).limit(limit - len(results))
+
+        results.extend(dict(row._mapping) for row in db.execute(query))
+        if len(results) >= limit:
+            break
+
+    return results
@@ -0,0 +1,241 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from database import FormulaUsageRollup, ClientUsageRollup
+from .partition_service import history_tables
+
+
+ROLLUP_GRANULARITIES = ("hour", "day")
+
+# Default look-back window of the dashboard queries per granularity
+DEFAULT_WINDOWS = {"hour": timedelta(hours=24), "day": timedelta(days=30)}
+
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """
+    Truncate a timestamp to the start of its rollup bucket.
+
+    Args:
+        timestamp (datetime): Time of the calculation
+        granularity (str): 'hour' or 'day'
+
+    Returns:
+        datetime: Start of the hour or day containing the timestamp
+    """
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def record_calculations(db: Session, events: Iterable[Tuple[datetime, str, Optional[str]]]) -> None:
+    """
+    Add calculations to the hour/day rollups without committing.
+
+    Events are aggregated in memory first, so a batch of N rows costs one
+    upsert per distinct (bucket, formula) and (bucket, client) pair.
+
+    Args:
+        db (Session): Database session the history rows are written with
+        events: Iterable of (timestamp, formula, client_ip) tuples
+    """
+    formula_counts = Counter()
+    client_counts = Counter()
+    _aggregate(events, formula_counts, client_counts)
+
+    _increment(db, FormulaUsageRollup, "formula", formula_counts)
+    _increment(db, ClientUsageRollup, "client", client_counts)
+
+
+def record_calculation(db: Session, timestamp: datetime, formula: str, client_ip: Optional[str]) -> None:
+    """Add a single calculation to the rollups without committing."""
+    record_calculations(db, [(timestamp, formula, client_ip)])
+
+
+def _aggregate(events, formula_counts: Counter, client_counts: Counter) -> None:
+    for timestamp, formula, client_ip in events:
+        for granularity in ROLLUP_GRANULARITIES:
+            start = bucket_start(timestamp, granularity)
+            formula_counts[(granularity, start, formula)] += 1
+            client_counts[(granularity, start, client_ip or "")] += 1
+
+
+def _increment(db: Session, model, key_column: str, counts: Counter) -> None:
+    """Upsert rollup counters using the dialect's native upsert where available."""
+    if not counts:
+        return
+
+    rows = [
+        {"granularity": granularity, "bucket_start": start, key_column: key, "calculations": count}
+        for (granularity, start, key), count in counts.items()
+    ]
+    table = model.__table__
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        stmt = stmt.on_duplicate_key_update(calculations=table.c.calculations + stmt.inserted.calculations)
+        db.execute(stmt, rows)
+    elif dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[column.name for column in table.primary_key.columns],
+            set_={"calculations": table.c.calculations + stmt.excluded.calculations}
+        )
+        db.execute(stmt, rows)
+    else:
+        # Generic fallback: try to bump an existing counter, insert if there is none
+        key = getattr(table.c, key_column)
+        for row in rows:
+            result = db.execute(
+                update(table)
+                .where(table.c.granularity == row["granularity"])
+                .where(table.c.bucket_start == row["bucket_start"])
+                .where(key == row[key_column])
+                .values(calculations=table.c.calculations + row["calculations"])
+            )
+            if result.rowcount == 0:
+                db.execute(table.insert().values(**row))
+
+
+def _window(granularity: str, since: Optional[datetime], until: Optional[datetime]) -> Tuple[datetime, datetime]:
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    until = until or datetime.now()
+    since = since or until - DEFAULT_WINDOWS[granularity]
+    return bucket_start(since, granularity), until
+
+
+def get_top_formulas(
+    db: Session,
+    granularity: str = "day",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 10
+) -> List[Dict]:
+    """
+    Most calculated formulas in a time window, read from the rollups only.
+
+    Returns:
+        List[Dict]: Formulas with their calculation counts, most frequent first
+    """
+    since, until = _window(granularity, since, until)
+    total = func.sum(FormulaUsageRollup.calculations).label("calculations")
+    rows = db.execute(
+        select(FormulaUsageRollup.formula, total)
+        .where(FormulaUsageRollup.granularity == granularity)
+        .where(FormulaUsageRollup.bucket_start >= since)
+        .where(FormulaUsageRollup.bucket_start <= until)
+        .group_by(FormulaUsageRollup.formula)
+        .order_by(total.desc())
+        .limit(limit)
+    ).all()
+    return [{"formula": formula, "calculations": int(count)} for formula, count in rows]
+
+
+def get_calculation_series(
+    db: Session,
+    granularity: str = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> List[Dict]:
+    """
+    Calculations and unique clients per hour or day, read from the rollups only.
+
+    Returns:
+        List[Dict]: One entry per non-empty bucket, oldest first
+    """
+    since, until = _window(granularity, since, until)
+    rows = db.execute(
+        select(
+            ClientUsageRollup.bucket_start,
+            func.sum(ClientUsageRollup.calculations),
+            func.count(ClientUsageRollup.client)
+        )
+        .where(ClientUsageRollup.granularity == granularity)
+        .where(ClientUsageRollup.bucket_start >= since)
+        .where(ClientUsageRollup.bucket_start <= until)
+        .group_by(ClientUsageRollup.bucket_start)
+        .order_by(ClientUsageRollup.bucket_start)
+    ).all()
+    return [
+        {"bucket_start": start, "calculations": int(count), "unique_clients": int(clients)}
+        for start, count, clients in rows
+    ]
+
+
+def get_stats_summary(
+    db: Session,
+    granularity: str = "day",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> Dict:
+    """
+    Totals over a time window: calculations, unique clients and unique formulas.
+
+    Returns:
+        Dict: Summary counters for the window
+    """
+    since, until = _window(granularity, since, until)
+    calculations, clients = db.execute(
+        select(func.sum(ClientUsageRollup.calculations), func.count(func.distinct(ClientUsageRollup.client)))
+        .where(ClientUsageRollup.granularity == granularity)
+        .where(ClientUsageRollup.bucket_start >= since)
+        .where(ClientUsageRollup.bucket_start <= until)
+    ).one()
+    formulas = db.execute(
+        select(func.count(func.distinct(FormulaUsageRollup.formula)))
+        .where(FormulaUsageRollup.granularity == granularity)
+        .where(FormulaUsageRollup.bucket_start >= since)
+        .where(FormulaUsageRollup.bucket_start <= until)
+    ).scalar()
+    return {
+        "since": since,
+        "until": until,
+        "calculations": int(calculations or 0),
+        "unique_clients": int(clients or 0),
+        "unique_formulas": int(formulas or 0)
+    }
+
+
+def rebuild_rollups(db: Session, batch_size: int = 10000) -> int:
+    """
+    Recompute all rollups from the raw history, including archived months.
+
+    Only needed once for history written before the rollups existed. The
+    tables are streamed and aggregated in memory, so memory use grows with the
+    number of rollup rows rather than the number of history rows.
+
+    Returns:
+        int: Number of history rows aggregated
+    """
+    formula_counts = Counter()
+    client_counts = Counter()
+    total = 0
+
+    for table in history_tables(db.get_bind()):
+        rows = db.execute(
+            select(table.c.timestamp, table.c.formula, table.c.user_ip)
+            .where(table.c.timestamp.isnot(None))
+            .execution_options(yield_per=batch_size)
+        )
+        for batch in rows.partitions():
+            _aggregate(batch, formula_counts, client_counts)
+            total += len(batch)
+
+    db.execute(delete(FormulaUsageRollup))
+    db.execute(delete(ClientUsageRollup))
+    _increment(db, FormulaUsageRollup, "formula", formula_counts)
+    _increment(db, ClientUsageRollup, "client", client_counts)
+    db.commit()
+    return total
@@ -0,0 +1,143 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session
+
+from core import settings
+from core.logging_config import get_logger
+from data.property_cache import PROPERTY_COLUMNS, get_property_cache
+from database import FormulaHistory, SessionLocal
+from utils import Deadline
+from .formula_service import calculate_molar_mass, parse_formula
+from .stats_service import get_top_formulas
+
+
+logger = get_logger("warmup")
+
+_state: Dict = {"status": "idle"}
+_state_lock = threading.Lock()
+
+
+def warmup_status() -> Dict:
+    """Current warm-up state: 'idle', 'warming', 'ready' or 'failed', with progress counters."""
+    with _state_lock:
+        return dict(_state)
+
+
+def _set_state(**values) -> None:
+    with _state_lock:
+        _state.update(values)
+
+
+def hot_formulas(db: Session, limit: int) -> List[str]:
+    """
+    Most frequently calculated formulas, most frequent first.
+
+    Read from the daily rollups only; with empty rollups (e.g. history written
+    before they existed, see rebuild_rollups) there is nothing to warm, since
+    grouping the raw history would mean a full scan on every cold start.
+    """
+    since = datetime.now() - timedelta(days=settings.WARMUP_LOOKBACK_DAYS)
+    return [row["formula"] for row in get_top_formulas(db, "day", since=since, limit=limit)]
+
+
+def _stored_properties(db: Session, formulas: List[str], deadline: Deadline, batch_size: int = 500) -> Dict[str, Dict]:
+    """Properties of the latest history entry with PubChem data, for each formula that has one."""
+    columns = [getattr(FormulaHistory, column) for column in PROPERTY_COLUMNS]
+    properties = {}
+    for start in range(0, len(formulas), batch_size):
+        if deadline.expired():
+            break
+        # One row per formula: the newest entry that has properties, found through the formula index
+        latest = (
+            select(func.max(FormulaHistory.id).label("id"))
+            .where(FormulaHistory.formula.in_(formulas[start:start + batch_size]))
+            .where(or_(FormulaHistory.iupac_name.isnot(None), FormulaHistory.compound_url.isnot(None)))
+            .group_by(FormulaHistory.formula)
+            .subquery()
+        )
+        rows = db.execute(
+            select(FormulaHistory.formula, *columns).join(latest, FormulaHistory.id == latest.c.id)
+        ).all()
+        for formula, *values in rows:
+            properties[formula] = dict(zip(PROPERTY_COLUMNS, values))
+    return properties
+
+
+def _load_hot_formulas(limit: int, deadline: Deadline) -> Tuple[List[str], Dict[str, Dict]]:
+    db = SessionLocal()
+    try:
+        formulas = hot_formulas(db, limit)
+        return formulas, _stored_properties(db, formulas, deadline)
+    finally:
+        db.close()
+
+
+def _warm_formula(formula: str, properties: Optional[Dict], cache) -> None:
+    try:
+        parse_formula(formula)
+        calculate_molar_mass(formula)
+    except ValueError:
+        return  # Invalid formulas in the history are simply not cached
+    if cache is not None and properties and cache.get(formula) is None:
+        cache.set(formula, properties)
+
+
+def warm_caches(
+    limit: int = settings.WARMUP_FORMULAS,
+    budget_seconds: float = settings.WARMUP_BUDGET_SECONDS,
+    workers: int = settings.WARMUP_CONCURRENCY
+) -> Dict:
+    """
+    Preload the caches with the hottest formulas from the history.
+
+    Fills the in-process parse and molar mass caches and copies the PubChem
+    properties already stored in the history into the shared property cache,
+    so the first requests after a deploy need neither parsing nor PubChem.
+    Stops when the time budget is spent; whatever is warmed by then stays.
+
+    Returns:
+        Dict: The final warm-up state
+    """
+    deadline = Deadline(budget_seconds)
+    start = time.monotonic()
+    _set_state(status="warming", started_at=datetime.now().isoformat(), formulas=0, warmed=0)
+    try:
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warmup")
+        # The queries count against the budget too; if they overrun, warm-up ends with nothing warmed
+        load = pool.submit(_load_hot_formulas, limit, deadline)
+        loaded, _ = wait([load], timeout=deadline.remaining())
+        formulas, properties = load.result() if loaded else ([], {})
+        if loaded and not formulas:
+            logger.info("No usage rollups yet, skipping cache warm-up")
+        _set_state(formulas=len(formulas))
+
+        cache = get_property_cache()
+        futures = [pool.submit(_warm_formula, formula, properties.get(formula), cache) for formula in formulas]
+        done, not_done = wait(futures, timeout=deadline.remaining())
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        _set_state(
+            status="ready",
+            warmed=len(done),
+            timed_out=bool(not_done) or not loaded,
+            duration_ms=round((time.monotonic() - start) * 1000, 1)
+        )
+        logger.info("Cache warm-up finished: %d of %d formulas in %.0f ms", len(done), len(formulas), (time.monotonic() - start) * 1000)
+    except Exception as e:
+        _set_state(status="failed", error=str(e), duration_ms=round((time.monotonic() - start) * 1000, 1))
+        logger.warning("Cache warm-up failed (non-critical): %s", e)
+    return warmup_status()
+
+
+def start_cache_warmup() -> None:
+    """Run warm_caches in a background thread; readiness reports 'warming' until it ends."""
+    if not settings.WARMUP_ENABLED:
+        _set_state(status="ready")
+        return
+    _set_state(status="warming")
+    threading.Thread(target=warm_caches, name="cache-warmup", daemon=True).start()
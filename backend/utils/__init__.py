@@ -2,6 +2,8 @@
 Utils package for ChemCalc backend.
 Contains utility functions and validators.
 """
+from .deadline import Deadline, DeadlineExceeded
+from .profiling import ProfilingMiddleware, get_slow_requests, stage
 from .validators import validate_formula
 
-__all__ = ["validate_formula"]
\ No newline at end of file
+__all__ = ["validate_formula", "Deadline", "DeadlineExceeded", "ProfilingMiddleware", "get_slow_requests", "stage"]
\ No newline at end of file
@@ -0,0 +1,35 @@
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage cannot start or finish within the remaining request budget."""
+
+
+class Deadline:
+    """
+    Latency budget shared by all stages of a request.
+
+    Stages ask for their timeout with `timeout(limit)` so that no stage can
+    outlive the request as a whole. A deadline of None never expires.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = time.monotonic() + seconds if seconds is not None else None
+
+    @classmethod
+    def from_ms(cls, milliseconds: Optional[float]) -> "Deadline":
+        return cls(milliseconds / 1000 if milliseconds is not None else None)
+
+    def remaining(self) -> float:
+        """Seconds left (infinite without a deadline, never negative)."""
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, limit: float) -> float:
+        """Timeout for the next stage: its own limit capped by the remaining budget."""
+        return min(limit, self.remaining())
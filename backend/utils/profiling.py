@@ -0,0 +1,180 @@
+import cProfile
+import io
+import pstats
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from core import settings
+from core.logging_config import request_id_var
+
+
+class RequestTrace:
+    """Stage timings, and optionally a cProfile profile, of one HTTP request."""
+
+    def __init__(self, method: str, path: str, profile: bool):
+        self.method = method
+        self.path = path
+        self.request_id = request_id_var.get()
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status: Optional[int] = None
+        self.stages: List[Dict] = []
+        self.stack: Optional[str] = None
+        self.thread_id = threading.get_ident()  # moves to the worker thread once a stage starts
+        self.profiler = cProfile.Profile() if profile else None
+        self._depth = 0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def to_dict(self) -> Dict:
+        profile = None
+        # A profiled request that never entered a stage has no profile data
+        if self.profiler is not None and self.profiler.getstats():
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=stream)
+            stats.sort_stats("cumulative").print_stats(settings.PROFILE_TOP_FUNCTIONS)
+            profile = stream.getvalue()
+        return {
+            "method": self.method,
+            "path": self.path,
+            "request_id": self.request_id,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 2),
+            "status": self.status,
+            "stages": self.stages,
+            "stack": self.stack,
+            "profile": profile,
+        }
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+_slow_requests = deque(maxlen=settings.SLOW_REQUEST_BUFFER_SIZE)
+_active_traces = set()
+_active_lock = threading.Lock()
+_watchdog: Optional[threading.Thread] = None
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a named stage of the current request (also usable as a decorator).
+
+    Without an active trace (profiling disabled or outside a request) this is
+    a single context variable lookup.
+    """
+    trace = _current_trace.get()
+    if trace is None or trace.duration_ms is not None:
+        # Background tasks run after the response inside the same context; they are not timed
+        yield
+        return
+
+    trace.thread_id = threading.get_ident()
+    # cProfile only sees the thread it is enabled in, so the outermost stage turns it on
+    profiling = trace.profiler is not None and trace._depth == 0
+    if profiling:
+        try:
+            trace.profiler.enable()
+        except ValueError:  # another profiler is active in this interpreter
+            profiling = False
+    trace._depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        trace._depth -= 1
+        if profiling:
+            trace.profiler.disable()
+        trace.stages.append({
+            "name": name,
+            "offset_ms": round((start - trace.start) * 1000, 2),
+            "duration_ms": round((end - start) * 1000, 2),
+        })
+
+
+def _watch_slow_requests() -> None:
+    """Capture the stack of every request still running past the slow threshold."""
+    interval = min(0.1, settings.SLOW_REQUEST_THRESHOLD_MS / 4000)
+    while True:
+        time.sleep(interval)
+        with _active_lock:
+            overdue = [
+                trace for trace in _active_traces
+                if trace.stack is None and trace.elapsed_ms() > settings.SLOW_REQUEST_THRESHOLD_MS
+            ]
+        if not overdue:
+            continue
+        frames = sys._current_frames()
+        for trace in overdue:
+            frame = frames.get(trace.thread_id)
+            trace.stack = "".join(traceback.format_stack(frame)) if frame else ""
+
+
+def get_slow_requests() -> List[Dict]:
+    """Slow and explicitly profiled requests, newest first."""
+    return list(reversed(_slow_requests))
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware tracing requests for the slow-request buffer.
+
+    A request is profiled with cProfile when it carries the X-Profile-Token
+    header matching PROFILING_TOKEN, or when it is picked by
+    PROFILING_SAMPLE_RATE. Every traced request that takes longer than
+    SLOW_REQUEST_THRESHOLD_MS gets its stack captured by a watchdog thread
+    while it is still running. Only installed when PROFILING_ENABLED is set.
+    """
+
+    def __init__(self, app):
+        global _watchdog
+        self.app = app
+        self.token = settings.PROFILING_TOKEN.encode() if settings.PROFILING_TOKEN else None
+        if _watchdog is None:
+            _watchdog = threading.Thread(target=_watch_slow_requests, name="slow-request-watchdog", daemon=True)
+            _watchdog.start()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = dict(scope["headers"]).get(b"x-profile-token")
+        profile = bool(self.token and token == self.token) or random.random() < settings.PROFILING_SAMPLE_RATE
+        trace = RequestTrace(scope["method"], scope["path"], profile)
+
+        def finish():
+            if trace.duration_ms is not None:
+                return
+            with _active_lock:
+                _active_traces.discard(trace)
+            trace.duration_ms = trace.elapsed_ms()
+            if profile or trace.duration_ms > settings.SLOW_REQUEST_THRESHOLD_MS:
+                _slow_requests.append(trace)
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+            await send(message)
+            # Starlette runs background tasks before the app call returns; they are not part of the request
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        reset = _current_trace.set(trace)
+        with _active_lock:
+            _active_traces.add(trace)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_trace.reset(reset)
+            finish()